@@ -0,0 +1,316 @@
+# Load test for the scoreboard routes.
+#
+# Seeds a board with the given number of teams and finished matches, then
+# hits /get_data, /update_score, /finish_match and /add_team from several
+# worker threads, through Flask's test client and/or over real HTTP, while
+# `viewers` clients stay subscribed to the board. Reports throughput and
+# p50/p99 latency per route and can save everything as JSON so two versions
+# can be compared.
+#
+#   python bench.py --teams 10 1000 10000 --history 500 --viewers 50 --json before.json
+#   python bench.py --mode http --persist sqlite --requests 2000 --workers 8
+#
+# Everything runs in a temporary directory, the real scoreboard files are
+# never touched.
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROUTES = ('get_data', 'update_score', 'finish_match', 'add_team')
+
+def load_app(persist):
+    # Import test.py by path (there is a stdlib package called `test`)
+    os.environ['SCOREBOARD_PERSIST'] = persist
+    sys.path.insert(0, HERE)
+    spec = importlib.util.spec_from_file_location('scoreboard', os.path.join(HERE, 'test.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def seed(board, teams, history, chunk=1000):
+    events = [{'op': 'add_team', 'team': f'team{i}'} for i in range(teams)]
+    for start in range(0, len(events), chunk):
+        board.commit_many(events[start:start + chunk])
+    for start in range(0, history, chunk):
+        events = []
+        for _ in range(min(chunk, history - start)):
+            events.append({'op': 'update_score', 'team': 1, 'delta': 1})
+            events.append({'op': 'finish_match'})
+        board.commit_many(events)
+
+class TestClient:
+    # Requests through Flask's test client, one client per worker thread
+
+    def __init__(self, app, prefix):
+        self.app = app
+        self.prefix = prefix
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(self.prefix + path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    # Requests over a kept-alive HTTP connection per worker thread
+
+    def __init__(self, host, port, prefix):
+        self.host = host
+        self.port = port
+        self.prefix = prefix
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        conn.request(method, self.prefix + path, payload, headers)
+        response = conn.getresponse()
+        text = response.read()
+        try:
+            return response.status, json.loads(text)
+        except ValueError:
+            return response.status, None
+
+def start_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class Handler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_viewers(mode, board, server, prefix, count):
+    # Keep `count` viewers subscribed until stop is set. Test client viewers
+    # subscribe to the board directly, HTTP viewers hold an /events stream.
+    stop = threading.Event()
+    ready = threading.Barrier(count + 1) if count else None
+
+    def direct():
+        subscriber = board.subscribe()
+        ready.wait()
+        try:
+            while not stop.is_set():
+                subscriber.get(0.2)
+        finally:
+            board.hub.unsubscribe(subscriber)
+
+    def stream():
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=1)
+        conn.request('GET', prefix + '/events')
+        response = conn.getresponse()
+        response.read1(65536)
+        ready.wait()
+        try:
+            while not stop.is_set():
+                try:
+                    response.read1(65536)
+                except OSError:
+                    pass
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=direct if mode == 'client' else stream, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    if ready:
+        ready.wait()
+    return stop, threads
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run_route(client, route, requests, workers, courts=1):
+    # Time `requests` calls of one route spread over `workers` threads.
+    # finish_match first gives team 1 a point (not timed) so the match isn't
+    # tied. Each worker finishes matches on its own court (worker % courts),
+    # so finishes run side by side like the other routes' calls. Workers
+    # sharing a court hold its lock from the point to the finish, so none of
+    # them can finish the match in between and every timed call is a real
+    # finish rather than the tie error. Throughput leaves out the time spent
+    # on those points, reported as setup_seconds.
+    court_locks = [threading.Lock() for _ in range(courts)]
+
+    def call(i, court):
+        if route == 'get_data':
+            return client.request('GET', '/get_data')
+        if route == 'update_score':
+            return client.request('POST', '/update_score', {'team': i % 2 + 1, 'delta': 1})
+        if route == 'finish_match':
+            return client.request('POST', f'/finish_match?court={court}')
+        return client.request('POST', '/add_team', {'team': f'bench{i}'})
+
+    def work(worker):
+        latencies = []
+        setup = 0.0
+        errors = rejected = 0
+        court = worker % courts
+        for i in range(worker, requests, workers):
+            if route == 'finish_match':
+                with court_locks[court]:
+                    start = time.perf_counter()
+                    client.request('POST', f'/update_score?court={court}', {'team': 1, 'delta': 1})
+                    setup += time.perf_counter() - start
+                    start = time.perf_counter()
+                    status, body = call(i, court)
+                    latencies.append(time.perf_counter() - start)
+            else:
+                start = time.perf_counter()
+                status, body = call(i, court)
+                latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+            elif isinstance(body, dict) and 'error' in body:
+                rejected += 1
+        return latencies, setup, errors, rejected
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(work, range(workers)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(t for worker_latencies, _, _, _ in results for t in worker_latencies)
+    # The workers run side by side, so each spent about the average setup
+    setup = sum(setup for _, setup, _, _ in results) / workers
+    return {
+        'route': route,
+        'requests': len(latencies),
+        'errors': sum(errors for _, _, errors, _ in results),
+        'rejected': sum(rejected for _, _, _, rejected in results),
+        'seconds': round(elapsed, 4),
+        'setup_seconds': round(setup, 4),
+        'throughput': round(len(latencies) / (elapsed - setup), 1),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    }
+
+def run_scenario(scoreboard, server, mode, teams, history, viewers, args):
+    # Every scenario gets its own board so they all start from the same state
+    board_id = f'bench-{mode}-{teams}-{history}-{viewers}'
+    board = scoreboard.get_board(board_id)
+    seed(board, teams, history)
+    prefix = f'/b/{board_id}'
+    if mode == 'client':
+        client = TestClient(scoreboard.app, prefix)
+    else:
+        client = HttpClient('127.0.0.1', server.server_port, prefix)
+    stop, threads = start_viewers(mode, board, server, prefix, viewers)
+    try:
+        results = []
+        for route in args.routes:
+            # A few untimed calls to warm up connections and caches
+            for i in range(min(args.workers, args.requests)):
+                client.request('GET', '/get_data')
+            if route == 'finish_match':
+                # A court per worker, as far as the teams go: a court needs
+                # two teams and one more keeps the shared queue from running
+                # dry. Back to one court afterwards for the other routes.
+                courts = max(1, min(args.workers, (teams - 1) // 2))
+                client.request('POST', '/set_courts', {'count': courts})
+                results.append(run_route(client, route, args.requests, args.workers, courts))
+                client.request('POST', '/set_courts', {'count': 1})
+            else:
+                results.append(run_route(client, route, args.requests, args.workers))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(2)
+    with board.lock:
+        state_bytes = len(json.dumps(board.data, default=scoreboard.to_json))
+    return {'mode': mode, 'teams': teams, 'history': history, 'viewers': viewers,
+            'state_bytes': state_bytes, 'routes': results}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scoreboard routes.')
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--teams', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--history', type=int, nargs='+', default=[100],
+                        help='finished matches played while seeding the board')
+    parser.add_argument('--viewers', type=int, nargs='+', default=[0],
+                        help='clients subscribed to live updates during the run')
+    parser.add_argument('--requests', type=int, default=500, help='requests per route')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent request threads')
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--persist', choices=('json', 'log', 'sqlite', 'binary', 'shared'),
+                        default=os.environ.get('SCOREBOARD_PERSIST', 'json'))
+    parser.add_argument('--label', help='name for this run, saved in the JSON')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    if min(args.teams) < 2:
+        parser.error('need at least 2 teams')
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix='scoreboard-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        scoreboard = load_app(args.persist)
+        modes = ('client', 'http') if args.mode == 'both' else (args.mode,)
+        server = start_server(scoreboard.app) if 'http' in modes else None
+        scenarios = []
+        print(f"{'mode':>6} {'teams':>6} {'hist':>5} {'view':>5} {'route':>13} "
+              f"{'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6} {'rejected':>8}")
+        for mode in modes:
+            for teams in args.teams:
+                for history in args.history:
+                    for viewers in args.viewers:
+                        scenario = run_scenario(scoreboard, server, mode, teams, history, viewers, args)
+                        scenarios.append(scenario)
+                        for r in scenario['routes']:
+                            print(f"{mode:>6} {teams:>6} {history:>5} {viewers:>5} {r['route']:>13} "
+                                  f"{r['throughput']:>9} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['errors']:>6} {r['rejected']:>8}")
+        if server:
+            server.shutdown()
+        scoreboard.close_boards()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({
+                'label': args.label,
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'args': vars(args),
+                'scenarios': scenarios,
+            }, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# In-memory records for a board's state: the queue/all_teams list and the
+# per-team stats. test.py, snapshot.py and the rotation rules share them;
+# they turn back into the stored JSON shape only when serialized.
+
+from collections import OrderedDict
+
+class TeamList:
+    # Ordered list of unique team names used for the queue and all_teams.
+    # Backed by an OrderedDict (hash index + linked list), so append, popleft,
+    # membership and removal from anywhere are all O(1) however long the
+    # rotation gets. Serializes to the same JSON list as before.
+
+    def __init__(self, teams=()):
+        self._teams = OrderedDict.fromkeys(teams)
+
+    def __len__(self):
+        return len(self._teams)
+
+    def __iter__(self):
+        return iter(self._teams)
+
+    def __contains__(self, team):
+        return team in self._teams
+
+    def __repr__(self):
+        return f'TeamList({list(self._teams)!r})'
+
+    def append(self, team):
+        self._teams[team] = None
+
+    def remove(self, team):
+        del self._teams[team]
+
+    def popleft(self):
+        return self._teams.popitem(last=False)[0]
+
+    def peek(self):
+        return next(iter(self._teams))
+
+class TeamStats:
+    # A team's wins and losses. Slotted, so it takes about a quarter of the
+    # memory of the {'wins': .., 'losses': ..} dict it replaces, but indexed
+    # like that dict, so record['wins'] += 1 and friends still work. It
+    # becomes the dict again only when serialized.
+    __slots__ = ('wins', 'losses')
+
+    def __init__(self, wins=0, losses=0):
+        self.wins = wins
+        self.losses = losses
+
+    def __getitem__(self, key):
+        if key not in TeamStats.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in TeamStats.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, TeamStats):
+            return (self.wins, self.losses) == (other.wins, other.losses)
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f'TeamStats(wins={self.wins}, losses={self.losses})'
+
+    def as_dict(self):
+        return {'wins': self.wins, 'losses': self.losses}
@@ -0,0 +1,214 @@
+# Winner-stays rotation rules, kept free of Flask and of the stored JSON
+# shape so they can be tested and simulated on their own
+
+import itertools
+import threading
+from collections import namedtuple
+
+from model import TeamList
+
+# Teams on court and their current win streaks
+Match = namedtuple('Match', 'team1 team2 streak1 streak2')
+
+# What finishing a match did. `rotated` is True when the winner went to the
+# queue after a streak, `challenger` is the queued team that replaced the
+# loser otherwise, and `next_match` is None when there weren't enough queued
+# teams to start another match.
+Outcome = namedtuple('Outcome', 'winner loser winner_streak rotated challenger next_match')
+
+class RotationEngine:
+    # Winner stays on and the loser goes to the back of the queue. With more
+    # than `small_group` teams, a winner reaching `streak_limit` wins in a row
+    # goes to the queue as well and the next two queued teams play. Teams can
+    # be any hashable ids; the engine only touches the queue it is given.
+
+    def __init__(self, streak_limit=2, small_group=3):
+        self.streak_limit = streak_limit
+        self.small_group = small_group
+        # _waits[streak][i]: see expected_matches(), grown on demand. Shared
+        # by every request thread, so growing and reading it take the lock.
+        self._waits = [[] for _ in range(streak_limit)]
+        self._waits_lock = threading.Lock()
+
+    def finish(self, match, team1_won, queue, total_teams):
+        # Moves teams through `queue` (a TeamList or anything with the same
+        # methods) and returns the Outcome
+        if team1_won:
+            winner, loser, winner_streak = match.team1, match.team2, match.streak1 + 1
+        else:
+            winner, loser, winner_streak = match.team2, match.team1, match.streak2 + 1
+        
+        self.send_to_back(queue, loser)
+        
+        if total_teams > self.small_group and winner_streak >= self.streak_limit:
+            self.send_to_back(queue, winner)
+            next_match = None
+            if len(queue) >= 2:
+                next_match = Match(queue.popleft(), queue.popleft(), 0, 0)
+            return Outcome(winner, loser, winner_streak, True, None, next_match)
+        
+        # Winner stays in the same position, the next queued team replaces the loser
+        if not queue or queue.peek() == winner:
+            return Outcome(winner, loser, winner_streak, False, None, None)
+        challenger = queue.popleft()
+        if team1_won:
+            next_match = Match(winner, challenger, winner_streak, 0)
+        else:
+            next_match = Match(challenger, winner, 0, winner_streak)
+        return Outcome(winner, loser, winner_streak, False, challenger, next_match)
+
+    def expected_matches(self, streak, count, total_teams):
+        # Expected number of matches, counting the one being played, until
+        # each of the first `count` queued teams gets on court, treating every
+        # match as a coin flip. `streak` is the streak of the team that stayed
+        # on. A match normally brings in one queued team but brings in two
+        # when a streak sends the winner to the queue, so this depends on it.
+        if total_teams <= self.small_group:
+            return [i + 1 for i in range(count)]
+        streak = min(streak, self.streak_limit - 1)
+        with self._waits_lock:
+            self._grow(count)
+            return self._waits[streak][:count]
+
+    def _grow(self, count):
+        # Fill _waits position by position; position i only needs i-1 and i-2
+        waits = self._waits
+        limit = self.streak_limit
+
+        def after(new_streak, i):
+            # (chance, teams brought in, streak on court next) -> expected rest
+            if new_streak >= limit:
+                return waits[0][i - 2] if i >= 2 else 0
+            return waits[new_streak][i - 1] if i >= 1 else 0
+
+        for i in range(len(waits[0]), count):
+            for streak in range(limit):
+                if streak == 0:
+                    # Fresh pair, whoever wins has a streak of 1
+                    rest = after(1, i)
+                else:
+                    rest = 0.5 * after(streak + 1, i) + 0.5 * after(1, i)
+                waits[streak].append(1.0 + rest)
+
+    def send_to_back(self, queue, team):
+        if team in queue:
+            queue.remove(team)
+        queue.append(team)
+
+class CourtScheduler:
+    # Winner-stays on several courts fed from one shared queue, with the same
+    # rules as RotationEngine counted over the whole pool of teams. Teams join
+    # the back of the queue as they come off any court, so whoever has sat
+    # out longest plays next and a team's gaps stay even however the courts
+    # interleave. A winner that stays on keeps its court; a Match with None
+    # on one side is such a winner waiting for a challenger. Every assignment
+    # is a TeamList append, popleft or removal, O(1) in the number of teams.
+    #
+    # The pair that just finished is not put straight back together while
+    # another court is playing: the winner waits for that court's loser
+    # instead. Otherwise, with as many teams as court places, every court
+    # would replay the same pair forever.
+
+    def __init__(self, courts, engine=None, queue=None):
+        # `courts` is a number of idle courts or a list of Match (or None)
+        # per court, e.g. rebuilt from stored state
+        self.engine = engine or RotationEngine()
+        self.courts = list(courts) if isinstance(courts, list) else [None] * courts
+        self.queue = queue if queue is not None else TeamList()
+        self.teams = len(self.queue) + sum(team is not None for match in self.courts if match for team in match[:2])
+        self.just_played = None
+
+    def add_team(self, team):
+        self.teams += 1
+        self.queue.append(team)
+
+    def remove_team(self, team):
+        # Returns the court the team was taken off, or None. Its opponent
+        # stays on that court and waits for a new challenger.
+        if team in self.queue:
+            self.queue.remove(team)
+            self.teams -= 1
+            return None
+        for court, match in enumerate(self.courts):
+            if match and team in match[:2]:
+                self.teams -= 1
+                if team == match.team1:
+                    match = match._replace(team1=None, streak1=0)
+                else:
+                    match = match._replace(team2=None, streak2=0)
+                self.courts[court] = None if match.team1 is None and match.team2 is None else match
+                return court
+        raise KeyError(team)
+
+    def playing(self, court):
+        match = self.courts[court]
+        return match is not None and match.team1 is not None and match.team2 is not None
+
+    def fill(self):
+        # Put queued teams on idle courts and against waiting winners.
+        # Returns [(court, Match)] for the matches started.
+        started = []
+        for court in range(len(self.courts)):
+            if not self.playing(court) and self.fill_court(court):
+                started.append((court, self.courts[court]))
+        return started
+
+    def fill_court(self, court):
+        # Returns True if a match started on `court`
+        match = self.courts[court]
+        heads = list(itertools.islice(self.queue, 2))
+        if match is None:
+            if len(heads) < 2 or not self.may_pair(court, *heads):
+                return False
+            self.courts[court] = Match(self.queue.popleft(), self.queue.popleft(), 0, 0)
+            return True
+        stayer = match.team1 if match.team2 is None else match.team2
+        for team in heads:
+            if self.may_pair(court, stayer, team):
+                self.queue.remove(team)
+                if match.team1 is None:
+                    self.courts[court] = match._replace(team1=team, streak1=0)
+                else:
+                    self.courts[court] = match._replace(team2=team, streak2=0)
+                return True
+        return False
+
+    def may_pair(self, court, team, other):
+        # A rematch of the pair that just finished only if no other court is
+        # playing, as nobody else is about to come off court
+        if self.just_played != {team, other}:
+            return True
+        return not any(self.playing(i) for i in range(len(self.courts)) if i != court)
+
+    def finish(self, court, team1_won):
+        # Finish the match on `court` and start its next one: the loser goes
+        # to the queue and the winner stays on against the next queued team,
+        # unless it reached the streak limit with more than small_group teams
+        # in the pool, in which case it is queued too and two queued teams
+        # come on. Returns the Outcome; next_match is None while the court
+        # waits for teams. Call fill() afterwards for the other courts.
+        if not self.playing(court):
+            raise ValueError(f'no match on court {court}')
+        match = self.courts[court]
+        engine = self.engine
+        if team1_won:
+            winner, loser, winner_streak = match.team1, match.team2, match.streak1 + 1
+        else:
+            winner, loser, winner_streak = match.team2, match.team1, match.streak2 + 1
+        self.just_played = {winner, loser}
+        engine.send_to_back(self.queue, loser)
+        rotated = self.teams > engine.small_group and winner_streak >= engine.streak_limit
+        if rotated:
+            engine.send_to_back(self.queue, winner)
+            self.courts[court] = None
+        elif team1_won:
+            self.courts[court] = Match(winner, None, winner_streak, 0)
+        else:
+            self.courts[court] = Match(None, winner, 0, winner_streak)
+        if not self.fill_court(court):
+            return Outcome(winner, loser, winner_streak, rotated, None, None)
+        next_match = self.courts[court]
+        challenger = None
+        if not rotated:
+            challenger = next_match.team2 if team1_won else next_match.team1
+        return Outcome(winner, loser, winner_streak, rotated, challenger, next_match)
@@ -0,0 +1,245 @@
+# Monte Carlo simulator for the winner-stays rotation.
+#
+# Plays many sessions side by side with NumPy, one array element per session,
+# applying the same rules as RotationEngine, and reports how many games each
+# team gets and how long teams sit out between games.
+#
+#   python simulate.py --teams 3 4 5 6 8 --sessions 1000000 --matches 60
+#   python simulate.py --check     # compare against RotationEngine first
+#   python simulate.py --teams 40 100 --courts 4 --sessions 200 --matches 400
+#
+# With --courts above 1, teams share one queue across that many courts
+# (CourtScheduler). Those sessions are played one at a time in plain Python,
+# so use far fewer of them; waits are then counted in matches finished on
+# any court.
+
+import argparse
+import heapq
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit('simulate.py needs NumPy: pip install numpy')
+
+from model import TeamList
+from rotation import CourtScheduler, Match, RotationEngine
+
+def play(n_teams, sessions, matches, skill_spread, rng, engine=None, record=False):
+    # Simulate `sessions` sessions of `matches` matches with n_teams teams.
+    # Team skills are drawn per session from N(0, skill_spread) and sorted so
+    # team 0 is always the strongest; team i beats team j with probability
+    # 1 / (1 + exp(skill_j - skill_i)).
+    engine = engine or RotationEngine()
+    s = np.arange(sessions)
+    skill = -np.sort(-rng.normal(0.0, skill_spread, (sessions, n_teams)), axis=1)
+    # Teams join in random order: the first two play, the rest queue
+    order = np.argsort(rng.random((sessions, n_teams)), axis=1)
+    team1, team2 = order[:, 0].copy(), order[:, 1].copy()
+    streak1 = np.zeros(sessions, dtype=np.int64)
+    streak2 = np.zeros(sessions, dtype=np.int64)
+    # Queue as a ring buffer per session
+    queue = np.zeros((sessions, n_teams), dtype=np.int64)
+    queue[:, :n_teams - 2] = order[:, 2:]
+    head = np.zeros(sessions, dtype=np.int64)
+    length = np.full(sessions, n_teams - 2, dtype=np.int64)
+    rotate_on_streak = n_teams > engine.small_group
+
+    games = np.zeros((sessions, n_teams), dtype=np.int64)
+    last_played = np.full((sessions, n_teams), -1, dtype=np.int64)
+    waits = np.zeros(matches + 1, dtype=np.int64)  # histogram of matches sat out
+    draws = rng.random((matches, sessions))
+    history = []
+
+    def push(team):
+        queue[s, (head + length) % n_teams] = team
+        length[:] += 1
+
+    def pop(mask):
+        team = queue[s, head]
+        head[mask] = (head[mask] + 1) % n_teams
+        length[mask] -= 1
+        return team
+
+    for k in range(matches):
+        for team in (team1, team2):
+            games[s, team] += 1
+            sat_out = k - 1 - last_played[s, team]
+            waits += np.bincount(sat_out[sat_out > 0], minlength=matches + 1)[:matches + 1]
+            last_played[s, team] = k
+
+        p_team1 = 1.0 / (1.0 + np.exp(skill[s, team2] - skill[s, team1]))
+        team1_won = draws[k] < p_team1
+        if record:
+            history.append((team1.copy(), team2.copy(), team1_won.copy()))
+        winner = np.where(team1_won, team1, team2)
+        loser = np.where(team1_won, team2, team1)
+        winner_streak = np.where(team1_won, streak1, streak2) + 1
+
+        # Every team is always on court or queued, so the loser is never
+        # already in the queue and the queue head is never the winner
+        push(loser)
+        rotate = winner_streak >= engine.streak_limit if rotate_on_streak else np.zeros(sessions, dtype=bool)
+        if rotate.any():
+            queue[s[rotate], (head[rotate] + length[rotate]) % n_teams] = winner[rotate]
+            length[rotate] += 1
+        first = pop(np.ones(sessions, dtype=bool))
+        second = pop(rotate)
+
+        stay = ~rotate
+        team1 = np.where(rotate, first, np.where(team1_won, winner, first))
+        team2 = np.where(rotate, second, np.where(team1_won, first, winner))
+        streak1 = np.where(stay & team1_won, winner_streak, 0)
+        streak2 = np.where(stay & ~team1_won, winner_streak, 0)
+
+    return {'games': games, 'waits': waits, 'order': order, 'history': history}
+
+def play_courts(n_teams, courts, sessions, matches, skill_spread, rng):
+    # Like play() but with the teams spread over `courts` courts. Match
+    # lengths are exponential with mean 1, so the courts finish in a random
+    # interleaving.
+    games = np.zeros((sessions, n_teams), dtype=np.int64)
+    waits = np.zeros(matches + 1, dtype=np.int64)
+    for i in range(sessions):
+        skill = -np.sort(-rng.normal(0.0, skill_spread, n_teams))
+        draws = rng.random(matches)
+        lengths = rng.exponential(1.0, matches + courts)
+        scheduler = CourtScheduler(courts)
+        for team in rng.permutation(n_teams).tolist():
+            scheduler.add_team(team)
+        left = {}  # team -> matches finished when it last came off court
+        ends = []  # (end time, court) of the matches being played
+        started = 0
+
+        def start(court, match):
+            nonlocal started
+            for team in match[:2]:
+                if team in left:
+                    sat_out = k - left.pop(team)
+                    if sat_out:
+                        waits[min(sat_out, matches)] += 1
+            heapq.heappush(ends, (now + lengths[started], court))
+            started += 1
+
+        k, now = 0, 0.0
+        for court, match in scheduler.fill():
+            start(court, match)
+        while k < matches and ends:
+            now, court = heapq.heappop(ends)
+            match = scheduler.courts[court]
+            team1_won = draws[k] < 1.0 / (1.0 + np.exp(skill[match.team2] - skill[match.team1]))
+            games[i, match.team1] += 1
+            games[i, match.team2] += 1
+            outcome = scheduler.finish(court, bool(team1_won))
+            k += 1
+            # A winner waiting on court for a challenger hasn't left it
+            on_court = scheduler.courts[court][:2] if scheduler.courts[court] else ()
+            for team in match[:2]:
+                if team not in on_court:
+                    left[team] = k
+            if outcome.next_match:
+                start(court, outcome.next_match)
+            for court, match in scheduler.fill():
+                start(court, match)
+    return {'games': games, 'waits': waits}
+
+def percentile(hist, q):
+    cumulative = np.cumsum(hist)
+    if not cumulative[-1]:
+        return 0
+    return int(np.searchsorted(cumulative, q * cumulative[-1]))
+
+def summarize(n_teams, sessions, matches, games, waits):
+    games_by_rank = games.mean(axis=0)
+    share = games / games.sum(axis=1, keepdims=True)
+    values = np.arange(len(waits))
+    return {
+        'teams': n_teams,
+        'sessions': sessions,
+        'matches': matches,
+        # Average games per session for the strongest .. weakest team
+        'games_by_skill_rank': [round(float(g), 3) for g in games_by_rank],
+        # Gap between the busiest and the idlest team within a session
+        'games_spread_mean': round(float((games.max(axis=1) - games.min(axis=1)).mean()), 3),
+        'games_share_min': round(float(share.min(axis=1).mean()), 4),
+        'games_share_max': round(float(share.max(axis=1).mean()), 4),
+        # Matches a team sits out between two of its games
+        'wait_mean': round(float((values * waits).sum() / max(waits.sum(), 1)), 3),
+        'wait_p50': percentile(waits, 0.5),
+        'wait_p90': percentile(waits, 0.9),
+        'wait_p99': percentile(waits, 0.99),
+        'wait_max': int(np.nonzero(waits)[0].max()) if waits.any() else 0,
+    }
+
+def simulate(n_teams, sessions, matches, skill_spread, seed, batch, courts=1):
+    rng = np.random.default_rng(seed)
+    if courts > 1:
+        result = play_courts(n_teams, courts, sessions, matches, skill_spread, rng)
+        return dict(summarize(n_teams, sessions, matches, result['games'], result['waits']), courts=courts)
+    games = []
+    waits = np.zeros(matches + 1, dtype=np.int64)
+    done = 0
+    while done < sessions:
+        size = min(batch, sessions - done)
+        result = play(n_teams, size, matches, skill_spread, rng)
+        games.append(result['games'])
+        waits += result['waits']
+        done += size
+    return summarize(n_teams, sessions, matches, np.concatenate(games), waits)
+
+def check(n_teams, matches, sessions=50, seed=1):
+    # Replay the simulated outcomes through RotationEngine one session at a
+    # time and make sure both produce the same matches
+    engine = RotationEngine()
+    result = play(n_teams, sessions, matches, 1.0, np.random.default_rng(seed), engine, record=True)
+    history = result['history']
+    for i in range(sessions):
+        order = [int(t) for t in result['order'][i]]
+        queue = TeamList(order[2:])
+        match = Match(order[0], order[1], 0, 0)
+        for k, (t1, t2, won) in enumerate(history):
+            if (match.team1, match.team2) != (int(t1[i]), int(t2[i])):
+                raise AssertionError(f'{n_teams} teams, session {i}, match {k}: engine has {match[:2]}, '
+                                     f'simulator has {(int(t1[i]), int(t2[i]))}')
+            match = engine.finish(match, bool(won[i]), queue, n_teams).next_match
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate winner-stays rotation sessions.')
+    parser.add_argument('--teams', type=int, nargs='+', default=[3, 4, 5, 6, 8, 10])
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--matches', type=int, default=40, help='matches per session')
+    parser.add_argument('--skill-spread', type=float, default=1.0,
+                        help='standard deviation of team skill (0 = coin flips)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--courts', type=int, default=1, help='courts sharing one queue')
+    parser.add_argument('--batch', type=int, default=200000, help='sessions simulated at once')
+    parser.add_argument('--check', action='store_true', help='verify against RotationEngine first')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if min(args.teams) < 3:
+        parser.error('need at least 3 teams')
+    if args.courts < 1 or min(args.teams) < 2 * args.courts:
+        parser.error('need at least one court and 2 teams per court')
+    if args.check:
+        for n_teams in args.teams:
+            check(n_teams, args.matches)
+        print('simulator matches RotationEngine')
+
+    results = []
+    print(f"{'teams':>5} {'games strongest..weakest':>32} {'spread':>7} {'wait mean':>9} {'p50':>4} {'p90':>4} {'p99':>4} {'max':>4}")
+    for n_teams in args.teams:
+        r = simulate(n_teams, args.sessions, args.matches, args.skill_spread, args.seed, args.batch, args.courts)
+        results.append(r)
+        by_rank = r['games_by_skill_rank']
+        games = f'{by_rank[0]:.1f} .. {by_rank[-1]:.1f}'
+        print(f"{n_teams:>5} {games:>32} {r['games_spread_mean']:>7} {r['wait_mean']:>9} "
+              f"{r['wait_p50']:>4} {r['wait_p90']:>4} {r['wait_p99']:>4} {r['wait_max']:>4}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# Compact binary snapshot of a board's state.
+#
+# Layout (little endian):
+#   header   magic b'SBSN', format version (H), section count (H)
+#   entries  one per section: name (16s), offset (Q), length (Q)
+#   sections
+#     meta       JSON object with current_match, timing and any other small keys
+#     queue      name list
+#     all_teams  name list
+#     stats      count (I), a wins and a losses array (count x I each), then
+#                the teams as a name list in the same order
+#     records    JSON object, the /stats records
+#
+# A name list is a count (I), the length of every name in characters (I each)
+# and then all names as one UTF-8 string, so decoding is one decode() and a
+# slice per name, interned so every copy of a name is one object. load()
+# decodes meta, queue and all_teams straight away and stats and records only
+# when something first uses them.
+#
+#   python snapshot.py scoreboard_data.json scoreboard_data.snap
+
+import itertools
+import json
+import struct
+import sys
+from collections.abc import MutableMapping
+
+from model import TeamList, TeamStats
+
+MAGIC = b'SBSN'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH')
+ENTRY = struct.Struct('<16sQQ')
+COUNT = struct.Struct('<I')
+
+class SnapshotError(ValueError):
+    pass
+
+def pack_names(names):
+    names = list(names)
+    return (COUNT.pack(len(names)) + struct.pack(f'<{len(names)}I', *map(len, names))
+            + ''.join(names).encode())
+
+def unpack_names(buf, offset, end):
+    count, = COUNT.unpack_from(buf, offset)
+    offset += COUNT.size
+    lengths = struct.unpack_from(f'<{count}I', buf, offset)
+    text = bytes(buf[offset + 4 * count:end]).decode()
+    bounds = list(itertools.accumulate(lengths, initial=0))
+    return [sys.intern(text[bounds[i]:bounds[i + 1]]) for i in range(count)], offset + 4 * count
+
+def pack_stats(stats):
+    names = list(stats)
+    count = len(names)
+    wins = struct.pack(f'<{count}I', *(stats[team]['wins'] for team in names))
+    losses = struct.pack(f'<{count}I', *(stats[team]['losses'] for team in names))
+    return COUNT.pack(count) + wins + losses + pack_names(names)
+
+def unpack_stats(buf, offset, end):
+    count, = COUNT.unpack_from(buf, offset)
+    offset += COUNT.size
+    wins = struct.unpack_from(f'<{count}I', buf, offset)
+    losses = struct.unpack_from(f'<{count}I', buf, offset + 4 * count)
+    names, _ = unpack_names(buf, offset + 8 * count, end)
+    return {team: TeamStats(w, l) for team, w, l in zip(names, wins, losses)}
+
+def dump(data, extra=None):
+    # Serialize board state (the same dict load_data returns) to bytes.
+    # `extra` keys are stored with the meta section, like save_data's.
+    meta = {key: value for key, value in data.items() if key not in ('queue', 'all_teams', 'stats', 'records')}
+    meta.update(extra or {})
+    sections = [
+        (b'meta', json.dumps(meta).encode()),
+        (b'queue', pack_names(data.get('queue', ()))),
+        (b'all_teams', pack_names(data.get('all_teams', ()))),
+        (b'stats', pack_stats(data.get('stats', {}))),
+    ]
+    records = data.get('records')
+    if isinstance(records, LazySection) and records.raw is not None:
+        # Not used since load(): copy the encoded section over as it is
+        sections.append((b'records', records.raw))
+    elif records is not None:
+        sections.append((b'records', json.dumps(records).encode()))
+    offset = HEADER.size + ENTRY.size * len(sections)
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, len(sections))]
+    for name, payload in sections:
+        parts.append(ENTRY.pack(name, offset, len(payload)))
+        offset += len(payload)
+    parts.extend(payload for _, payload in sections)
+    return b''.join(parts)
+
+class LazySection(MutableMapping):
+    # Stand-in for data[key] (the stats or the records) until it is first
+    # used. The first use decodes it, puts the real dict into `data` in its
+    # place and forwards to it, so later lookups don't go through here at
+    # all. Not a dict subclass on purpose: json would see an empty dict,
+    # while this way it falls back to the default hook, which calls resolve().
+    # `raw` is the encoded section while it is still unused, for dump().
+
+    def __init__(self, data, key, decode, raw=None):
+        self._data = data
+        self._key = key
+        self._decode = decode
+        self._value = None
+        self.raw = raw
+
+    def resolve(self):
+        if self._value is None:
+            self._value = self._decode()
+            self._decode = None
+            self.raw = None
+            if self._data.get(self._key) is self:
+                self._data[self._key] = self._value
+        return self._value
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __setitem__(self, key, value):
+        self.resolve()[key] = value
+
+    def __delitem__(self, key):
+        del self.resolve()[key]
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __contains__(self, key):
+        return key in self.resolve()
+
+def load(buf):
+    # Decode a snapshot made by dump(). Stats and records stay encoded until
+    # first use.
+    buf = memoryview(buf)
+    if len(buf) < HEADER.size:
+        raise SnapshotError('snapshot too short')
+    magic, version, count = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise SnapshotError('not a scoreboard snapshot')
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f'unsupported snapshot version {version}')
+    sections = {}
+    for i in range(count):
+        name, offset, length = ENTRY.unpack_from(buf, HEADER.size + ENTRY.size * i)
+        if offset + length > len(buf):
+            raise SnapshotError('snapshot is truncated')
+        sections[name.rstrip(b'\0').decode()] = (offset, offset + length)
+
+    data = json.loads(bytes(buf[slice(*sections['meta'])]))
+    data['queue'] = TeamList(unpack_names(buf, *sections['queue'])[0])
+    data['all_teams'] = TeamList(unpack_names(buf, *sections['all_teams'])[0])
+    data['stats'] = LazySection(data, 'stats', lambda: unpack_stats(buf, *sections['stats']))
+    if 'records' in sections:
+        # Older snapshots kept the records in meta
+        raw = buf[slice(*sections['records'])]
+        data['records'] = LazySection(data, 'records', lambda: json.loads(bytes(raw)), raw)
+    return data
+
+def convert(json_path, snapshot_path):
+    with open(json_path) as f:
+        data = json.load(f)
+    blob = dump(data)
+    with open(snapshot_path, 'wb') as f:
+        f.write(blob)
+    return len(blob)
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit('usage: python snapshot.py scoreboard_data.json [scoreboard_data.snap]')
+    json_path = sys.argv[1]
+    snapshot_path = sys.argv[2] if len(sys.argv) == 3 else json_path.rsplit('.', 1)[0] + '.snap'
+    size = convert(json_path, snapshot_path)
+    print(f'wrote {snapshot_path} ({size} bytes)')
+
+if __name__ == '__main__':
+    main()
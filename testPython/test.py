@@ -1,45 +1,1080 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, abort, g, render_template_string, request, jsonify
+import atexit
+import bisect
+import csv
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
 import json
 import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import snapshot
+from model import TeamList, TeamStats
+from rotation import CourtScheduler, Match, RotationEngine
 
 app = Flask(__name__)
 
 # File to store data
 DATA_FILE = 'scoreboard_data.json'
 
+# Other boards (courts) live under /b/<board_id>/ and keep their files in
+# BOARDS_DIR; the default board keeps using DATA_FILE, LOG_FILE and DB_FILE
+DEFAULT_BOARD = 'default'
+BOARDS_DIR = 'boards'
+BOARD_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Boards nobody touched for this many seconds are dropped from memory
+BOARD_IDLE_TIMEOUT = 600
+BOARD_IDLE_CHECK = 60
+
+# Persistence mode:
+#   'json'   - rewrite DATA_FILE after every change (default)
+#   'log'    - append each change to LOG_FILE and only rewrite DATA_FILE as a
+#              periodic snapshot, so a change costs the same no matter how big
+#              the state is
+#   'sqlite' - keep the state in DB_FILE, update only the rows a change
+#              touches and record every finished match for /history
+#   'binary' - rewrite SNAPSHOT_FILE, a compact binary snapshot (see
+#              snapshot.py), after every change; starting up only decodes
+#              the match and the queue, stats and records are decoded on
+#              first use
+#   'shared' - 'sqlite' for running several worker processes on the same
+#              files (e.g. gunicorn -w 4 test:app). Writes are serialized
+#              across processes by SQLite's write lock and each worker
+#              reloads a board when another one has changed it.
+# The other modes assume a single process.
+PERSIST_MODE = os.environ.get('SCOREBOARD_PERSIST', 'json')
+LOG_FILE = 'scoreboard_events.log'
+DB_FILE = 'scoreboard.db'
+SNAPSHOT_FILE = 'scoreboard_data.snap'
+# Seconds to wait for another process's write to finish in sqlite modes
+SQLITE_BUSY_TIMEOUT = 30
+# How often 'shared' mode checks boards with live viewers for changes made
+# by other workers, in seconds
+SHARED_POLL_INTERVAL = 0.25
+# Events are written to the OS straight away; fsync is batched and happens
+# after LOG_FSYNC_EVERY events or LOG_FSYNC_INTERVAL seconds, whichever first
+LOG_FSYNC_EVERY = 20
+LOG_FSYNC_INTERVAL = 0.5
+# Write a snapshot and truncate the log after this many events
+SNAPSHOT_EVERY = 1000
+
+# Write-behind for 'json' mode: with SCOREBOARD_WRITE_BEHIND_MS > 0 a change
+# only marks the board dirty and a background thread saves dirty boards that
+# often, so requests never wait for the disk. A crash loses at most the last
+# WRITE_BEHIND_MS milliseconds of changes, and never more than
+# WRITE_BEHIND_MAX_EVENTS events: reaching that many unsaved events makes
+# the request that hit the limit save before it returns.
+WRITE_BEHIND_MS = int(os.environ.get('SCOREBOARD_WRITE_BEHIND_MS', '0'))
+WRITE_BEHIND_MAX_EVENTS = 100
+
+# Seconds between keep-alive comments on idle /events streams
+SSE_KEEPALIVE = 15
+# State updates buffered per viewer before the oldest are dropped
+SUBSCRIBER_BUFFER = 1
+# Longest a /poll request waits for a change, in seconds
+LONG_POLL_TIMEOUT = 25
+
+# The page is rendered and compressed once at startup; browsers may reuse it
+# for this many seconds before revalidating with its ETag
+PAGE_MAX_AGE = 300
+# JSON responses at least this big are gzipped for clients that accept it
+GZIP_MIN_SIZE = 1024
+
+# Match length estimate behind /eta: an exponential moving average of
+# finished match durations, DEFAULT_MATCH_SECONDS until the first one.
+# Durations outside the MIN/MAX range (a match left open over a break) are ignored.
+DEFAULT_MATCH_SECONDS = 600
+MIN_MATCH_SECONDS = 30
+MAX_MATCH_SECONDS = 3 * 3600
+MATCH_TIME_ALPHA = 0.2
+
+# Static export for spectator screens: with SCOREBOARD_EXPORT_DIR set, each
+# board's state is also written to <dir>/state.json (other boards to
+# <dir>/b/<board_id>/state.json, like their URLs) next to a read-only
+# index.html that polls it, so any static file server can serve the viewers.
+# Files are replaced atomically and a board is written at most once per
+# EXPORT_DEBOUNCE_MS, however fast it changes. In 'shared' mode set it for
+# one worker only, that one also picks up the other workers' changes.
+EXPORT_DIR = os.environ.get('SCOREBOARD_EXPORT_DIR', '')
+EXPORT_DEBOUNCE_MS = int(os.environ.get('SCOREBOARD_EXPORT_DEBOUNCE_MS', '250'))
+# How often the exported page reloads state.json
+EXPORT_POLL_SECONDS = 2
+
+# /export_teams sends this many rows per chunk
+EXPORT_CHUNK_ROWS = 1000
+# At most this many bad lines are listed in an /import_teams response
+IMPORT_MAX_REPORTED = 20
+
+# Upper bounds (seconds) of the latency histogram buckets on /metrics
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Admin routes (/admin/...) need this in an X-Admin-Token header; without
+# it set they don't exist
+ADMIN_TOKEN = os.environ.get('SCOREBOARD_ADMIN_TOKEN', '')
+# Sampling profiler, off until enabled through /admin/profile: this share of
+# requests is profiled, and the stacks of the ones in progress are sampled
+# every PROFILE_INTERVAL_MS. At most PROFILE_MAX_STACKS different stacks are
+# kept, further ones count as "[other]".
+PROFILE_FRACTION = 0.1
+PROFILE_INTERVAL_MS = 5
+PROFILE_MAX_STACKS = 20000
+PROFILE_MAX_DEPTH = 100
+
+# Results of this many recent Idempotency-Key requests are kept per board,
+# a retry of one of them gets the stored result instead of applying it again
+IDEMPOTENCY_KEYS_KEEP = 1000
+
+# How many per-team stats changes to remember for /get_data?since= deltas,
+# clients that are further behind get the full state instead
+STATS_CHANGES_KEEP = 10000
+
+# Courts sharing one board's queue (set_courts). Court 0 is current_match,
+# the others are in data['courts'].
+MAX_COURTS = 32
+
+# A match finishing this long after the previous one starts a new session
+# in the /stats windows
+SESSION_GAP_SECONDS = 4 * 3600
+
+def new_match():
+    return {'team1': '', 'team2': '', 'score1': 0, 'score2': 0, 'team1_streak': 0, 'team2_streak': 0}
+
+def new_timing():
+    return {'match_started': None, 'avg_match_seconds': None, 'matches_timed': 0}
+
+def new_records():
+    # Aggregates kept up to date by every finished match, served by /stats:
+    # wins/losses for the current session and day, a sparse head-to-head
+    # table {team: {opponent: [wins, losses]}} and win streaks that only a
+    # loss ends (unlike the on-court streak, which the queue also resets)
+    return {
+        'session': {'started': None, 'last_match': None, 'stats': {}},
+        'day': {'date': None, 'stats': {}},
+        'head_to_head': {},
+        'streaks': {},
+        'longest_streak': None,
+    }
+
+class _RankNode:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # Number of positions each link skips over
+        self.width = [1] * levels
+
+class RankIndex:
+    # Indexable skip list of unique sortable keys: insert, remove and lookup
+    # by position are all O(log n), so a ranking can be kept up to date one
+    # team at a time instead of being re-sorted
+
+    MAX_LEVELS = 24
+
+    def __init__(self, keys=()):
+        self.head = _RankNode(None, self.MAX_LEVELS)
+        self.size = 0
+        for key in sorted(keys):
+            self.insert(key)
+
+    def __len__(self):
+        return self.size
+
+    def _find(self, key):
+        # Last node before `key` on every level, plus its position
+        chain = [None] * self.MAX_LEVELS
+        positions = [0] * self.MAX_LEVELS
+        node = self.head
+        position = 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key):
+        chain, positions = self._find(key)
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        node = _RankNode(key, levels)
+        # New node sits at position positions[0] + 1
+        for level in range(levels):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - (positions[0] - positions[level])
+            prev.width[level] = positions[0] - positions[level] + 1
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def slice(self, offset, limit):
+        # Keys at positions offset .. offset + limit - 1
+        if offset >= self.size:
+            return []
+        node = self.head
+        remaining = offset + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < limit:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+def to_json(obj):
+    # JSON fallback for the in-memory structures that aren't plain lists/dicts
+    if isinstance(obj, TeamList):
+        return list(obj)
+    if isinstance(obj, TeamStats):
+        return obj.as_dict()
+    if isinstance(obj, snapshot.LazySection):
+        return obj.resolve()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+app.json.default = to_json
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class Counter:
+    # Prometheus counter with labels: label values -> running total
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, values=(), amount=1):
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help}')
+        lines.append(f'# TYPE {self.name} counter')
+        with self.lock:
+            items = sorted(self.values.items())
+        for values, total in items:
+            lines.append(f'{self.name}{format_labels(self.labels, values)} {total}')
+
+class Histogram:
+    # Prometheus histogram with labels. Observing is a bisect and two
+    # additions under a lock, cheap enough to leave on all the time.
+
+    def __init__(self, name, help, labels=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [count per bucket (+Inf last), sum]
+
+    def observe(self, values, amount):
+        i = bisect.bisect_left(self.buckets, amount)
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += amount
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help}')
+        lines.append(f'# TYPE {self.name} histogram')
+        with self.lock:
+            items = sorted((values, list(counts), total) for values, (counts, total) in self.series.items())
+        names = self.labels + ('le',)
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{format_labels(names, values + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, values)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, values)} {cumulative}')
+
+class Profiler:
+    # Statistical profiler for request handlers. Chosen requests register
+    # their thread; one background thread looks at those threads' stacks
+    # every `interval` seconds and counts each (route, stack) it sees. Costs
+    # nothing while off and, while on, a dict update for sampled requests
+    # plus one sys._current_frames() per interval when any is running.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.fraction = PROFILE_FRACTION
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.active = {}  # thread id -> route of the profiled request
+        self.stacks = {}  # (route, stack) -> samples
+        self.samples = 0
+        self.labels = {}  # code object -> frame label
+        self.thread = None
+
+    def configure(self, enabled, fraction, interval):
+        with self.lock:
+            self.fraction = fraction
+            self.interval = interval
+            self.enabled = enabled
+            if enabled and self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def start(self, route):
+        if self.enabled and random.random() < self.fraction:
+            with self.lock:
+                self.active[threading.get_ident()] = route
+
+    def stop(self):
+        if self.active:
+            with self.lock:
+                self.active.pop(threading.get_ident(), None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.enabled:
+                    self.thread = None
+                    self.active.clear()
+                    return
+                interval = self.interval
+                active = dict(self.active)
+            if active:
+                frames = sys._current_frames()
+                stacks = [(route, self.collapse(frames[ident])) for ident, route in active.items() if ident in frames]
+                with self.lock:
+                    for key in stacks:
+                        if key not in self.stacks and len(self.stacks) >= PROFILE_MAX_STACKS:
+                            key = (key[0], '[other]')
+                        self.stacks[key] = self.stacks.get(key, 0) + 1
+                        self.samples += 1
+            time.sleep(interval)
+
+    def collapse(self, frame):
+        # Frames root first joined by ';', as flamegraph.pl and speedscope read them
+        labels = []
+        while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+            code = frame.f_code
+            label = self.labels.get(code)
+            if label is None:
+                name = getattr(code, 'co_qualname', code.co_name)
+                label = self.labels[code] = f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+            labels.append(label)
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def status(self):
+        with self.lock:
+            return {'enabled': self.enabled, 'fraction': self.fraction, 'interval_ms': self.interval * 1000,
+                    'samples': self.samples, 'stacks': len(self.stacks)}
+
+    def collapsed(self, route=None, reset=False):
+        # "route;frame;...;frame count" lines, heaviest first
+        with self.lock:
+            stacks = self.stacks
+            if reset:
+                self.stacks = {}
+                self.samples = 0
+        lines = [(count, f'{r};{stack}') for (r, stack), count in stacks.items() if route is None or r == route]
+        lines.sort(reverse=True)
+        return ''.join(f'{line} {count}\n' for count, line in lines)
+
+PROFILER = Profiler()
+
+REQUESTS = Counter('scoreboard_http_requests_total', 'HTTP requests handled.', ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram('scoreboard_http_request_duration_seconds',
+                            'Time from receiving a request to returning its response.', ('route',))
+PERSIST_SECONDS = Histogram('scoreboard_persist_write_seconds', 'Time spent persisting changes.', ('mode',))
+PERSIST_BYTES = Counter('scoreboard_persist_written_bytes_total',
+                        'Bytes written to data and snapshot files (file) and event logs (log).', ('kind',))
+
 # Initialize or load data
-def load_data():
+def load_data(path):
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return complete_data(json.load(f))
+    return complete_data({})
+
+def intern_team(team):
+    # Team names are interned wherever they enter the state, so the queue,
+    # all_teams, current_match and the stats keys share one string per team
+    # and comparing or looking up names is mostly a pointer check
+    return sys.intern(team) if isinstance(team, str) else team
+
+def complete_data(loaded_data):
     default_data = {
-        'current_match': {'team1': '', 'team2': '', 'score1': 0, 'score2': 0, 'team1_streak': 0, 'team2_streak': 0},
-        'queue': [],
-        'all_teams': [],
-        'stats': {}
+        'current_match': new_match(),
+        'queue': TeamList(),
+        'all_teams': TeamList(),
+        'stats': {},
+        'timing': new_timing(),
+        'records': new_records(),
+        'courts': []
     }
     
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
-            loaded_data = json.load(f)
-        
-        # Merge with defaults to ensure all keys exist
-        for key in default_data:
-            if key not in loaded_data:
-                loaded_data[key] = default_data[key]
-        
-        # Ensure current_match has all fields
-        if 'team1_streak' not in loaded_data['current_match']:
-            loaded_data['current_match']['team1_streak'] = 0
-        if 'team2_streak' not in loaded_data['current_match']:
-            loaded_data['current_match']['team2_streak'] = 0
-        
-        return loaded_data
+    # Merge with defaults to ensure all keys exist
+    for key in default_data:
+        if key not in loaded_data:
+            loaded_data[key] = default_data[key]
     
-    return default_data
+    # Ensure current_match has all fields
+    if 'team1_streak' not in loaded_data['current_match']:
+        loaded_data['current_match']['team1_streak'] = 0
+    if 'team2_streak' not in loaded_data['current_match']:
+        loaded_data['current_match']['team2_streak'] = 0
+    
+    for match in [loaded_data['current_match']] + loaded_data['courts']:
+        match['team1'] = intern_team(match['team1'])
+        match['team2'] = intern_team(match['team2'])
+    if not isinstance(loaded_data['queue'], TeamList):
+        loaded_data['queue'] = TeamList(map(intern_team, loaded_data['queue']))
+    if not isinstance(loaded_data['all_teams'], TeamList):
+        loaded_data['all_teams'] = TeamList(map(intern_team, loaded_data['all_teams']))
+    if isinstance(loaded_data['stats'], dict):
+        loaded_data['stats'] = {intern_team(team): TeamStats(record['wins'], record['losses'])
+                                for team, record in loaded_data['stats'].items()}
+    return loaded_data
+
+def save_data(data, path, extra=None):
+    write_file(path, json.dumps(dict(data, **extra) if extra else data, default=to_json))
+
+def write_file(path, text):
+    # Write to a temp file and rename so a crash never leaves a half written file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    PERSIST_BYTES.inc(('file',), len(text))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb' if isinstance(text, bytes) else 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class JsonStore:
+    # Rewrites the whole data file on every change
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        data = load_data(self.path)
+        data.pop('_seq', None)
+        return data
+
+    def append(self, applied, data):
+        save_data(data, self.path)
+
+    def close(self):
+        pass
+
+class BinaryStore:
+    # Rewrites a binary snapshot on every change, like JsonStore but much
+    # faster to load back when there are lots of teams
+
+    def __init__(self, path, legacy_json_path):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                return complete_data(snapshot.load(f.read()))
+        # First start in binary mode: carry over the JSON data file
+        data = load_data(self.legacy_json_path)
+        data.pop('_seq', None)
+        if os.path.exists(self.legacy_json_path):
+            self.append([], data)
+        return data
+
+    def append(self, applied, data):
+        write_file(self.path, snapshot.dump(data))
+
+    def close(self):
+        pass
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS current_match (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    team1 TEXT NOT NULL, team2 TEXT NOT NULL,
+    score1 INTEGER NOT NULL, score2 INTEGER NOT NULL,
+    team1_streak INTEGER NOT NULL, team2_streak INTEGER NOT NULL
+);
+-- all_teams in order
+CREATE TABLE IF NOT EXISTS teams (name TEXT PRIMARY KEY, position INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS teams_position ON teams (position);
+-- queue in order, a team moving to the back gets a new seq
+CREATE TABLE IF NOT EXISTS queue (team TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS queue_seq ON queue (seq);
+CREATE TABLE IF NOT EXISTS stats (
+    team TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS stats_wins ON stats (wins);
+-- append-only match history, survives clear_stats
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finished_at REAL NOT NULL,
+    winner TEXT NOT NULL, loser TEXT NOT NULL,
+    winner_score INTEGER NOT NULL, loser_score INTEGER NOT NULL,
+    winner_streak INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_winner ON matches (winner, id);
+CREATE INDEX IF NOT EXISTS matches_loser ON matches (loser, id);
+-- /stats records (see new_records), a few rows upserted per finished match;
+-- meta 'records' keeps the window bounds and the longest streak
+CREATE TABLE IF NOT EXISTS head_to_head (
+    team TEXT NOT NULL, opponent TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0, losses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (team, opponent)
+);
+CREATE TABLE IF NOT EXISTS streaks (
+    team TEXT PRIMARY KEY,
+    current INTEGER NOT NULL DEFAULT 0,
+    longest INTEGER NOT NULL DEFAULT 0
+);
+-- wins/losses in the current 'session' and 'day'
+CREATE TABLE IF NOT EXISTS window_stats (
+    window TEXT NOT NULL, team TEXT NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0, losses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (window, team)
+);
+'''
+
+RECORD_TABLES = ('head_to_head', 'streaks', 'window_stats')
+
+class SqliteStore:
+    # Keeps the state in SQLite tables and writes only the rows an event
+    # touched, plus a row per finished match in the `matches` history.
+    # Callers serialize access with the board lock.
+
+    def __init__(self, path, legacy_path):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.db = None
+
+    def load(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SQLITE_SCHEMA)
+        with self.db:
+            # IMMEDIATE so two processes opening a new database don't both import
+            self.db.execute('BEGIN IMMEDIATE')
+            if not self.db.execute("SELECT 1 FROM meta WHERE key = 'created'").fetchone():
+                # New database: start from the JSON file if there is one
+                self.import_data(load_data(self.legacy_path))
+                self.db.execute("INSERT INTO meta VALUES ('created', ?)", (time.time(),))
+        return self.read()
+
+    def read(self):
+        row = self.db.execute('SELECT team1, team2, score1, score2, team1_streak, team2_streak FROM current_match').fetchone()
+        match = dict(zip(('team1', 'team2', 'score1', 'score2', 'team1_streak', 'team2_streak'), row))
+        match['team1'] = intern_team(match['team1'])
+        match['team2'] = intern_team(match['team2'])
+        timing = self.db.execute("SELECT value FROM meta WHERE key = 'timing'").fetchone()
+        courts = self.db.execute("SELECT value FROM meta WHERE key = 'courts'").fetchone()
+        courts = json.loads(courts[0]) if courts else []
+        for court in courts:
+            court['team1'] = intern_team(court['team1'])
+            court['team2'] = intern_team(court['team2'])
+        return {
+            'current_match': match,
+            'queue': TeamList(intern_team(team) for team, in self.db.execute('SELECT team FROM queue ORDER BY seq')),
+            'all_teams': TeamList(intern_team(name) for name, in self.db.execute('SELECT name FROM teams ORDER BY position')),
+            'stats': {intern_team(team): TeamStats(wins, losses)
+                      for team, wins, losses in self.db.execute('SELECT team, wins, losses FROM stats ORDER BY rowid')},
+            'timing': json.loads(timing[0]) if timing else new_timing(),
+            'records': self.read_records(),
+            'courts': courts,
+        }
+
+    def read_records(self):
+        records = new_records()
+        bounds = self.db.execute("SELECT value FROM meta WHERE key = 'records'").fetchone()
+        if bounds:
+            bounds = json.loads(bounds[0])
+            records['session']['started'] = bounds['session_started']
+            records['session']['last_match'] = bounds['last_match']
+            records['day']['date'] = bounds['date']
+            records['longest_streak'] = bounds['longest_streak']
+        windows = {'session': records['session']['stats'], 'day': records['day']['stats']}
+        for window, team, wins, losses in self.db.execute('SELECT window, team, wins, losses FROM window_stats ORDER BY rowid'):
+            windows[window][intern_team(team)] = {'wins': wins, 'losses': losses}
+        h2h = records['head_to_head']
+        for team, opponent, wins, losses in self.db.execute('SELECT team, opponent, wins, losses FROM head_to_head ORDER BY rowid'):
+            h2h.setdefault(intern_team(team), {})[intern_team(opponent)] = [wins, losses]
+        records['streaks'] = {intern_team(team): {'current': current, 'longest': longest}
+                              for team, current, longest in self.db.execute('SELECT team, current, longest FROM streaks ORDER BY rowid')}
+        return records
+
+    def import_data(self, data):
+        data.pop('_seq', None)
+        self.db.execute('DELETE FROM teams')
+        self.db.execute('DELETE FROM queue')
+        self.db.execute('DELETE FROM stats')
+        self.db.executemany('INSERT INTO teams VALUES (?, ?)', ((team, i) for i, team in enumerate(data['all_teams'])))
+        self.db.executemany('INSERT INTO queue VALUES (?, ?)', ((team, i) for i, team in enumerate(data['queue'])))
+        self.db.executemany('INSERT INTO stats VALUES (?, ?, ?)',
+                            ((team, record['wins'], record['losses']) for team, record in data['stats'].items()))
+        self.write_match(data)
+        records = data['records']
+        for table in RECORD_TABLES:
+            self.db.execute(f'DELETE FROM {table}')
+        self.db.executemany('INSERT INTO head_to_head VALUES (?, ?, ?, ?)',
+                            ((team, opponent, wins, losses) for team, row in records['head_to_head'].items()
+                             for opponent, (wins, losses) in row.items()))
+        self.db.executemany('INSERT INTO streaks VALUES (?, ?, ?)',
+                            ((team, streak['current'], streak['longest']) for team, streak in records['streaks'].items()))
+        for window in ('session', 'day'):
+            self.db.executemany('INSERT INTO window_stats VALUES (?, ?, ?, ?)',
+                                ((window, team, record['wins'], record['losses'])
+                                 for team, record in records[window]['stats'].items()))
+        self.write_record_bounds(data)
+
+    def write_match(self, data):
+        match = data['current_match']
+        self.db.execute('INSERT OR REPLACE INTO current_match VALUES (1, ?, ?, ?, ?, ?, ?)',
+                        (match['team1'], match['team2'], match['score1'], match['score2'],
+                         match['team1_streak'], match['team2_streak']))
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('timing', ?)", (json.dumps(data['timing']),))
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('courts', ?)", (json.dumps(data['courts']),))
+
+    def write_record_bounds(self, data):
+        records = data['records']
+        bounds = {
+            'session_started': records['session']['started'],
+            'last_match': records['session']['last_match'],
+            'date': records['day']['date'],
+            'longest_streak': records['longest_streak'],
+        }
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('records', ?)", (json.dumps(bounds),))
+
+    def write_finish_records(self, ts, winner, loser, records):
+        # The same counts update_records keeps in memory, as upserts. Only
+        # matches in the windows that are current after the whole batch
+        # count there; older windows' rows were deleted by append().
+        self.db.execute('INSERT INTO head_to_head VALUES (?, ?, 1, 0) '
+                        'ON CONFLICT (team, opponent) DO UPDATE SET wins = wins + 1', (winner, loser))
+        self.db.execute('INSERT INTO head_to_head VALUES (?, ?, 0, 1) '
+                        'ON CONFLICT (team, opponent) DO UPDATE SET losses = losses + 1', (loser, winner))
+        self.db.execute('INSERT INTO streaks VALUES (?, 1, 1) '
+                        'ON CONFLICT (team) DO UPDATE SET current = current + 1, longest = MAX(longest, current + 1)', (winner,))
+        self.db.execute('INSERT INTO streaks VALUES (?, 0, 0) ON CONFLICT (team) DO UPDATE SET current = 0', (loser,))
+        started = records['session']['started']
+        windows = []
+        if started is not None and ts >= started:
+            windows.append('session')
+        if records['day']['date'] == time.strftime('%Y-%m-%d', time.localtime(ts)):
+            windows.append('day')
+        for window in windows:
+            self.db.execute('INSERT INTO window_stats VALUES (?, ?, 1, 0) '
+                            'ON CONFLICT (window, team) DO UPDATE SET wins = wins + 1', (window, winner))
+            self.db.execute('INSERT INTO window_stats VALUES (?, ?, 0, 1) '
+                            'ON CONFLICT (window, team) DO UPDATE SET losses = losses + 1', (window, loser))
+
+    def start_record_windows(self, data):
+        # Drop the rows of a session or day that ended during this batch
+        bounds = self.db.execute("SELECT value FROM meta WHERE key = 'records'").fetchone()
+        if not bounds:
+            return
+        bounds = json.loads(bounds[0])
+        records = data['records']
+        if bounds['session_started'] != records['session']['started']:
+            self.db.execute("DELETE FROM window_stats WHERE window = 'session'")
+        if bounds['date'] != records['day']['date']:
+            self.db.execute("DELETE FROM window_stats WHERE window = 'day'")
+
+    def queue_last(self, team, data):
+        # `team` was (re)appended to the queue; skip it if a later event in
+        # the same batch already took it out again
+        if team in data['queue']:
+            self.db.execute('INSERT OR REPLACE INTO queue VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM queue))', (team,))
+        else:
+            self.db.execute('DELETE FROM queue WHERE team = ?', (team,))
+
+    def unqueue_playing(self, data):
+        # The teams on court came off the front of the queue
+        for match in court_matches(data):
+            for team in (match['team1'], match['team2']):
+                self.db.execute('DELETE FROM queue WHERE team = ?', (team,))
+
+    def append(self, applied, data):
+        # `data` is the state after all the events, so rows are written from
+        # it; per-event work only decides which rows need writing
+        finished = any(event['op'] == 'finish_match' for event, _ in applied)
+        with self.db:
+            if finished:
+                self.start_record_windows(data)
+            for event, result in applied:
+                op = event['op']
+                if op == 'add_team':
+                    team = event['team']
+                    self.db.execute('INSERT INTO teams VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM teams))', (team,))
+                    self.db.execute('INSERT OR IGNORE INTO stats (team) VALUES (?)', (team,))
+                    self.queue_last(team, data)
+                elif op == 'remove_team':
+                    self.db.execute('DELETE FROM teams WHERE name = ?', (event['team'],))
+                    self.db.execute('DELETE FROM queue WHERE team = ?', (event['team'],))
+                    if data['courts']:
+                        # A queued team may have taken its place on court
+                        self.unqueue_playing(data)
+                elif op == 'finish_match':
+                    self.db.execute('INSERT OR IGNORE INTO stats (team) VALUES (?), (?)', (result['winner'], result['loser']))
+                    self.db.execute('UPDATE stats SET wins = wins + 1 WHERE team = ?', (result['winner'],))
+                    self.db.execute('UPDATE stats SET losses = losses + 1 WHERE team = ?', (result['loser'],))
+                    self.db.execute('INSERT INTO matches (finished_at, winner, loser, winner_score, loser_score, winner_streak) '
+                                    'VALUES (?, ?, ?, ?, ?, ?)',
+                                    (event['ts'], result['winner'], result['loser'], result['winner_score'],
+                                     result['loser_score'], result['winner_streak']))
+                    self.write_finish_records(event['ts'], result['winner'], result['loser'], data['records'])
+                    # The loser (and a winner on a 2-win streak) went to the back,
+                    # the next match's teams came off the front
+                    self.queue_last(result['loser'], data)
+                    self.queue_last(result['winner'], data)
+                    self.unqueue_playing(data)
+                elif op == 'set_courts':
+                    # Teams moved between the queue and courts, rare enough to rewrite it
+                    self.db.execute('DELETE FROM queue')
+                    self.db.executemany('INSERT INTO queue VALUES (?, ?)', ((team, i) for i, team in enumerate(data['queue'])))
+                elif op == 'clear_stats':
+                    self.db.execute('DELETE FROM teams')
+                    self.db.execute('DELETE FROM queue')
+                    self.db.execute('DELETE FROM stats')
+                    for table in RECORD_TABLES:
+                        self.db.execute(f'DELETE FROM {table}')
+            self.write_match(data)
+            if finished or any(event['op'] == 'clear_stats' for event, _ in applied):
+                self.write_record_bounds(data)
+
+    def history(self, team=None, before=None, limit=50):
+        # Finished matches, newest first, optionally only those involving `team`
+        # and only older than match id `before` (for paging)
+        sql = 'SELECT id, finished_at, winner, loser, winner_score, loser_score, winner_streak FROM matches'
+        where = []
+        args = []
+        if team is not None:
+            where.append('(winner = ? OR loser = ?)')
+            args += [team, team]
+        if before is not None:
+            where.append('id < ?')
+            args.append(before)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        args.append(limit)
+        columns = ('id', 'finished_at', 'winner', 'loser', 'winner_score', 'loser_score', 'winner_streak')
+        return [dict(zip(columns, row)) for row in self.db.execute(sql, args)]
+
+    def close(self):
+        if self.db:
+            self.db.close()
+            self.db = None
+
+class SharedSqliteStore(SqliteStore):
+    # SqliteStore for several worker processes sharing one database. A board
+    # changes only inside BEGIN IMMEDIATE (SQLite's cross-process write lock)
+    # and every commit also stores the board version, so all workers hand out
+    # the same versions. PRAGMA data_version tells a worker cheaply whether
+    # another process committed since it last read the state.
+
+    def __init__(self, path, legacy_path):
+        super().__init__(path, legacy_path)
+        self.version = None
+        self.data_version = None
+
+    def load(self):
+        super().load()
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            if not self.db.execute("SELECT 1 FROM meta WHERE key = 'version'").fetchone():
+                # Start from the clock, like a single-process board
+                self.db.execute("INSERT INTO meta VALUES ('version', ?)", (int(time.time() * 1000),))
+        return self.read_shared()
+
+    def read_shared(self):
+        # State and version from one read transaction (or from the write
+        # transaction begin() opened). data_version is taken first, so a
+        # commit racing with this read only causes one extra reload.
+        self.data_version = self.db.execute('PRAGMA data_version').fetchone()[0]
+        started = not self.db.in_transaction
+        if started:
+            self.db.execute('BEGIN')
+        try:
+            data = self.read()
+            self.version = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        finally:
+            if started:
+                self.db.commit()
+        return data
+
+    def changed(self):
+        # Has another process committed since the state was last read?
+        return self.db.execute('PRAGMA data_version').fetchone()[0] != self.data_version
+
+    def begin(self):
+        # Take the write lock; held until append() commits or rollback()
+        self.db.execute('BEGIN IMMEDIATE')
+
+    def rollback(self):
+        if self.db.in_transaction:
+            self.db.rollback()
+
+    def write_match(self, data):
+        super().write_match(data)
+        self.db.execute("UPDATE meta SET value = ? WHERE key = 'version'", (self.version,))
+
+class EventLog:
+    # Append-only log of applied operations. The board's data file doubles as
+    # the snapshot and remembers the sequence number of the last event it
+    # contains, so startup is "load snapshot, replay every later event".
+
+    def __init__(self, path, snapshot_path):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.seq = 0
+        self.since_snapshot = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.file = None
+
+    def load(self):
+        return self.replay(load_data(self.snapshot_path))
+
+    def replay(self, data):
+        snapshot_seq = data.pop('_seq', 0)
+        self.seq = snapshot_seq
+        good_bytes = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash, everything after it is lost
+                        break
+                    good_bytes += len(line)
+                    if event['seq'] <= snapshot_seq:
+                        # Already in the snapshot (crash before the log was truncated)
+                        continue
+                    apply_event(data, event)
+                    self.seq = event['seq']
+                    self.since_snapshot += 1
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.file = open(self.path, 'ab')
+        if self.file.tell() != good_bytes:
+            self.file.truncate(good_bytes)
+        return data
+
+    def append(self, applied, data):
+        lines = []
+        for event, _ in applied:
+            self.seq += 1
+            event['seq'] = self.seq
+            lines.append(json.dumps(event).encode() + b'\n')
+        payload = b''.join(lines)
+        self.file.write(payload)
+        self.file.flush()
+        PERSIST_BYTES.inc(('log',), len(payload))
+        self.unsynced += len(applied)
+        self.since_snapshot += len(applied)
+        if self.since_snapshot >= SNAPSHOT_EVERY:
+            self.snapshot(data)
+        elif self.unsynced >= LOG_FSYNC_EVERY or time.monotonic() - self.last_sync >= LOG_FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def snapshot(self, data):
+        # Compaction: everything up to self.seq is in the snapshot, so the log can start over
+        save_data(data, self.snapshot_path, {'_seq': self.seq})
+        self.file.truncate(0)
+        self.file.seek(0)
+        self.since_snapshot = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+SPECTATOR_TEMPLATE = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Scoreboard</title>
+    <style>
+        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+        body {
+            font-family: Arial, sans-serif;
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+            min-height: 100vh;
+            padding: 20px;
+        }
+        .container {
+            max-width: 800px;
+            margin: 0 auto;
+        }
+        .card {
+            background: white;
+            border-radius: 15px;
+            padding: 25px;
+            margin-bottom: 20px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+        }
+        h2 {
+            color: #333;
+            margin-bottom: 20px;
+        }
+        .scoreboard {
+            display: grid;
+            grid-template-columns: 1fr auto 1fr;
+            gap: 20px;
+            align-items: center;
+            text-align: center;
+        }
+        .team-name {
+            font-size: 24px;
+            font-weight: bold;
+            color: #667eea;
+            word-wrap: break-word;
+        }
+        .score {
+            font-size: 64px;
+            font-weight: bold;
+            color: #333;
+        }
+        .vs {
+            font-size: 24px;
+            color: #999;
+        }
+        li {
+            padding: 8px 0;
+            border-bottom: 1px solid #eee;
+            list-style-position: inside;
+            color: #333;
+        }
+        .empty, .updated {
+            color: #999;
+        }
+        .updated {
+            text-align: center;
+            color: white;
+            font-size: 12px;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="card">
+            <div class="scoreboard">
+                <div><div class="team-name" id="team1"></div><div class="score" id="score1">0</div></div>
+                <div class="vs">VS</div>
+                <div><div class="team-name" id="team2"></div><div class="score" id="score2">0</div></div>
+            </div>
+        </div>
+        <div class="card">
+            <h2>Up Next</h2>
+            <ol id="queue"></ol>
+        </div>
+        <div class="card">
+            <h2>Standings</h2>
+            <ol id="stats"></ol>
+        </div>
+        <p class="updated" id="updated"></p>
+    </div>
+    <script>
+        // Read-only view of the exported state.json next to this page
+        let version = null;
+
+        function fill(list, rows) {
+            list.replaceChildren(...rows.map(text => {
+                const li = document.createElement('li');
+                li.textContent = text;
+                return li;
+            }));
+            if (!rows.length) {
+                const li = document.createElement('li');
+                li.className = 'empty';
+                li.textContent = 'Nobody yet';
+                list.append(li);
+            }
+        }
 
-def save_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f)
+        function render(state) {
+            const match = state.current_match;
+            document.getElementById('team1').textContent = match.team1 || 'Waiting...';
+            document.getElementById('team2').textContent = match.team2 || 'Waiting...';
+            document.getElementById('score1').textContent = match.score1;
+            document.getElementById('score2').textContent = match.score2;
+            fill(document.getElementById('queue'), state.queue);
+            const standings = Object.entries(state.stats)
+                .sort((a, b) => b[1].wins - a[1].wins || a[1].losses - b[1].losses || (a[0] < b[0] ? -1 : 1));
+            fill(document.getElementById('stats'), standings.map(([team, r]) => `${team}: ${r.wins}W - ${r.losses}L`));
+        }
 
-data = load_data()
+        function load() {
+            fetch('state.json', {cache: 'no-cache'})
+                .then(r => r.json())
+                .then(exported => {
+                    if (exported.version !== version) {
+                        version = exported.version;
+                        render(exported.state);
+                    }
+                    document.getElementById('updated').textContent = `Updated ${new Date().toLocaleTimeString()}`;
+                })
+                .catch(() => {})
+                .finally(() => setTimeout(load, __POLL_MS__));
+        }
+
+        load();
+    </script>
+</body>
+</html>
+'''
 
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -137,6 +1172,21 @@ HTML_TEMPLATE = '''
             background: #64748b;
             color: white;
         }
+        .bulk-teams {
+            display: flex;
+            gap: 10px;
+            margin-bottom: 20px;
+        }
+        .bulk-teams .btn-secondary {
+            flex: 1;
+            padding: 10px;
+            border-radius: 8px;
+            text-align: center;
+            text-decoration: none;
+            font-size: 14px;
+            font-weight: bold;
+            cursor: pointer;
+        }
         button:hover {
             transform: translateY(-2px);
             box-shadow: 0 5px 15px rgba(0,0,0,0.2);
@@ -161,7 +1211,12 @@ HTML_TEMPLATE = '''
             outline: none;
             border-color: #667eea;
         }
+        .scroll-list {
+            max-height: 480px;
+            overflow-y: auto;
+        }
         .queue-item {
+            height: 50px;
             background: #f8fafc;
             padding: 15px;
             border-radius: 8px;
@@ -174,6 +1229,10 @@ HTML_TEMPLATE = '''
             font-weight: bold;
             color: #333;
         }
+        .queue-eta {
+            color: #64748b;
+            font-size: 14px;
+        }
         .team-chip {
             background: #e0e7ff;
             color: #4338ca;
@@ -202,6 +1261,7 @@ HTML_TEMPLATE = '''
             gap: 15px;
         }
         .stat-item {
+            height: 80px;
             background: #f8fafc;
             padding: 15px;
             border-radius: 8px;
@@ -301,6 +1361,10 @@ HTML_TEMPLATE = '''
             </div>
             <input type="text" id="newTeam" placeholder="Enter team name">
             <button class="btn-primary" onclick="addTeam()" style="width: 100%; margin-bottom: 20px;">Add Team</button>
+            <div class="bulk-teams">
+                <label class="btn-secondary">Import CSV / NDJSON<input type="file" id="importFile" accept=".csv,.ndjson,.jsonl" onchange="importTeams(this)" hidden></label>
+                <a class="btn-secondary" id="exportLink" href="#">Export CSV</a>
+            </div>
             
             <h3 style="margin-top: 20px; margin-bottom: 10px;">All Teams (<span id="teamCount">0</span>)</h3>
             <div class="teams-container" id="teamsList"></div>
@@ -309,105 +1373,317 @@ HTML_TEMPLATE = '''
         <div class="card">
             <h2>🎯 Current Queue</h2>
             <p style="color: #64748b; margin-bottom: 15px;">Next team to play: <strong id="nextTeam">-</strong></p>
-            <div id="queueList"></div>
+            <p id="queueEmpty" style="color: #64748b;">Queue is empty</p>
+            <div class="scroll-list" id="queueViewport"><div id="queueList"></div></div>
         </div>
 
         <div class="card">
             <h2>📊 Team Statistics</h2>
-            <div class="stats-grid" id="statsList"></div>
+            <div class="scroll-list" id="statsViewport"><div class="stats-grid" id="statsList"></div></div>
             <button class="btn-danger" onclick="clearStats()" style="width: 100%; margin-top: 20px;">Clear All Stats</button>
         </div>
     </div>
 
     <script>
-        function loadData() {
-            fetch('/get_data')
+        // '' for the default board, '/b/<board_id>' for any other
+        const BASE = location.pathname.replace(/\\/$/, '');
+        document.getElementById('exportLink').href = `${BASE}/export_teams`;
+
+        function render(data) {
+            // Update scoreboard
+            document.getElementById('team1Name').textContent = data.current_match.team1 || 'Team 1';
+            document.getElementById('team2Name').textContent = data.current_match.team2 || 'Team 2';
+            document.getElementById('score1').textContent = data.current_match.score1;
+            document.getElementById('score2').textContent = data.current_match.score2;
+            
+            // Update streaks
+            const streak1 = data.current_match.team1_streak;
+            const streak2 = data.current_match.team2_streak;
+            document.getElementById('team1Streak').textContent = streak1 > 0 ? `🔥 ${streak1} win streak` : '';
+            document.getElementById('team2Streak').textContent = streak2 > 0 ? `🔥 ${streak2} win streak` : '';
+
+            // Update all teams
+            document.getElementById('teamCount').textContent = data.all_teams.length;
+            syncList(document.getElementById('teamsList'), data.all_teams, team => {
+                const chip = document.createElement('div');
+                chip.className = 'team-chip';
+                const button = document.createElement('button');
+                button.textContent = '×';
+                button.onclick = () => removeTeam(team);
+                chip.append(team, button);
+                return chip;
+            }, () => {});
+
+            // Update queue display
+            document.getElementById('queueEmpty').hidden = data.queue.length > 0;
+            document.getElementById('nextTeam').textContent = data.queue.length ? data.queue[0] : '-';
+            syncWindow(document.getElementById('queueViewport'), document.getElementById('queueList'),
+                       data.queue, QUEUE_ROW_HEIGHT, () => {
+                const div = document.createElement('div');
+                div.className = 'queue-item';
+                div.innerHTML = '<span class="queue-teams"></span><span class="queue-eta"></span>';
+                return div;
+            }, (div, team, idx) => {
+                const eta = etaByTeam[team];
+                setText(div.firstChild, `#${idx + 1}: ${team}`);
+                setText(div.lastChild, eta === undefined ? '' : `~${Math.max(1, Math.round(eta / 60))} min`);
+            });
+
+            // Wait estimates only change when the queue or match does
+            const etaKey = JSON.stringify([data.queue, data.current_match.team1, data.current_match.team2]);
+            if (etaKey !== lastEtaKey) {
+                lastEtaKey = etaKey;
+                loadEta();
+            }
+
+            // Update stats
+            syncWindow(document.getElementById('statsViewport'), document.getElementById('statsList'),
+                       Object.keys(data.stats), STAT_ROW_HEIGHT, () => {
+                const div = document.createElement('div');
+                div.className = 'stat-item';
+                div.innerHTML = '<div class="stat-name"></div><div class="stat-record"></div>';
+                return div;
+            }, (div, team) => {
+                const record = data.stats[team];
+                setText(div.firstChild, team);
+                setText(div.lastChild, `${record.wins}W - ${record.losses}L`);
+            });
+        }
+
+        // Lists are rendered by key: every team keeps its element between
+        // updates and only text that changed is written. The queue and stats
+        // lists only have elements for the rows scrolled into view.
+        const LIST_VIEW_HEIGHT = 480;  // max-height of .scroll-list
+        const QUEUE_ROW_HEIGHT = 60;   // .queue-item height + margin
+        const STAT_ROW_HEIGHT = 95;    // .stat-item height + grid gap
+        const VIRTUAL_OVERSCAN = 4;    // extra rows rendered above and below the view
+
+        function setText(el, text) {
+            if (el.textContent !== text) {
+                el.textContent = text;
+            }
+        }
+
+        function syncList(container, keys, create, update) {
+            // Make the container's children the elements for `keys`, in order,
+            // reusing the element each key had last time
+            const nodes = container.nodes || (container.nodes = new Map());
+            const wanted = new Set(keys);
+            nodes.forEach((node, key) => {
+                if (!wanted.has(key)) {
+                    node.remove();
+                    nodes.delete(key);
+                }
+            });
+            let next = container.firstChild;
+            keys.forEach((key, idx) => {
+                let node = nodes.get(key);
+                if (!node) {
+                    node = create(key);
+                    nodes.set(key, node);
+                }
+                update(node, key, idx);
+                if (node === next) {
+                    next = next.nextSibling;
+                } else {
+                    container.insertBefore(node, next);
+                }
+            });
+        }
+
+        function syncWindow(viewport, container, keys, rowHeight, create, update) {
+            // syncList for just the rows in view; padding stands in for the rest
+            const columns = getComputedStyle(container).gridTemplateColumns.split(' ').length;
+            const rows = Math.ceil(keys.length / columns);
+            const first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - VIRTUAL_OVERSCAN);
+            const last = Math.min(rows, first + Math.ceil(LIST_VIEW_HEIGHT / rowHeight) + 2 * VIRTUAL_OVERSCAN);
+            container.style.paddingTop = `${first * rowHeight}px`;
+            container.style.paddingBottom = `${Math.max(0, rows - last) * rowHeight}px`;
+            syncList(container, keys.slice(first * columns, last * columns), create,
+                     (node, key, idx) => update(node, key, first * columns + idx));
+        }
+
+        // Renders are batched: however many updates arrive, the page is
+        // redrawn at most once per frame with the newest state
+        let renderPending = false;
+
+        function scheduleRender() {
+            if (renderPending || !state) {
+                return;
+            }
+            renderPending = true;
+            requestAnimationFrame(() => {
+                renderPending = false;
+                render(displayState());
+            });
+        }
+
+        ['queueViewport', 'statsViewport'].forEach(id => {
+            document.getElementById(id).addEventListener('scroll', scheduleRender, {passive: true});
+        });
+        window.addEventListener('resize', scheduleRender);
+
+        // Estimated wait in seconds per queued team, from /eta
+        let etaByTeam = {};
+        let lastEtaKey = null;
+
+        function loadEta() {
+            fetch(`${BASE}/eta`)
                 .then(r => r.json())
-                .then(data => {
-                    // Update scoreboard
-                    document.getElementById('team1Name').textContent = data.current_match.team1 || 'Team 1';
-                    document.getElementById('team2Name').textContent = data.current_match.team2 || 'Team 2';
-                    document.getElementById('score1').textContent = data.current_match.score1;
-                    document.getElementById('score2').textContent = data.current_match.score2;
-                    
-                    // Update streaks
-                    const streak1 = data.current_match.team1_streak;
-                    const streak2 = data.current_match.team2_streak;
-                    document.getElementById('team1Streak').textContent = streak1 > 0 ? `🔥 ${streak1} win streak` : '';
-                    document.getElementById('team2Streak').textContent = streak2 > 0 ? `🔥 ${streak2} win streak` : '';
-
-                    // Update all teams
-                    const teamsList = document.getElementById('teamsList');
-                    teamsList.innerHTML = '';
-                    document.getElementById('teamCount').textContent = data.all_teams.length;
-                    data.all_teams.forEach(team => {
-                        const chip = document.createElement('div');
-                        chip.className = 'team-chip';
-                        chip.innerHTML = `
-                            ${team}
-                            <button onclick="removeTeam('${team.replace(/'/g, "\\'")}')">×</button>
-                        `;
-                        teamsList.appendChild(chip);
+                .then(result => {
+                    etaByTeam = {};
+                    result.queue.forEach(entry => {
+                        etaByTeam[entry.team] = entry.eta_seconds;
                     });
+                    scheduleRender();
+                });
+        }
+        // Refresh the countdown every 30 seconds
+        setInterval(loadEta, 30000);
 
-                    // Update queue display
-                    const queueList = document.getElementById('queueList');
-                    queueList.innerHTML = '';
-                    if (data.queue.length === 0) {
-                        queueList.innerHTML = '<p style="color: #64748b;">Queue is empty</p>';
-                        document.getElementById('nextTeam').textContent = '-';
-                    } else {
-                        document.getElementById('nextTeam').textContent = data.queue[0];
-                        data.queue.forEach((team, idx) => {
-                            const div = document.createElement('div');
-                            div.className = 'queue-item';
-                            div.innerHTML = `
-                                <span class="queue-teams">#${idx + 1}: ${team}</span>
-                            `;
-                            queueList.appendChild(div);
-                        });
+        // Last full state seen and its version, polling only asks for what changed since
+        let state = null;
+        let stateVersion = null;
+
+        function mergeState(version, full, changes) {
+            // Apply a full state or a delta from the server. Anything not newer
+            // than what we have is ignored, so late responses can't go back.
+            version = Number(version);
+            if (state && version <= stateVersion) {
+                return;
+            }
+            if (full) {
+                state = changes;
+            } else if (state) {
+                ['current_match', 'queue', 'all_teams', 'timing', 'courts'].forEach(key => {
+                    if (key in changes) {
+                        state[key] = changes[key];
                     }
+                });
+                Object.assign(state.stats, changes.stats || {});
+            } else {
+                return;
+            }
+            stateVersion = version;
+            scheduleRender();
+        }
 
-                    // Update stats
-                    const statsList = document.getElementById('statsList');
-                    statsList.innerHTML = '';
-                    Object.entries(data.stats).forEach(([team, record]) => {
-                        const div = document.createElement('div');
-                        div.className = 'stat-item';
-                        div.innerHTML = `
-                            <div class="stat-name">${team}</div>
-                            <div class="stat-record">${record.wins}W - ${record.losses}L</div>
-                        `;
-                        statsList.appendChild(div);
-                    });
+        // Score taps show up straight away: they are kept in pendingTaps and
+        // drawn on top of the server state until the server has answered all
+        // of them. States that arrive meanwhile wait in heldState (the newest
+        // one wins), so a tap is never counted twice or dropped from view.
+        let pendingTaps = [];
+        let heldState = null;
+
+        function offerState(version, full, changes) {
+            if (pendingTaps.some(tap => !tap.done)) {
+                if (!heldState || Number(version) > Number(heldState[0])) {
+                    heldState = [version, full, changes];
+                }
+            } else {
+                mergeState(version, full, changes);
+            }
+        }
+
+        function displayState() {
+            if (!pendingTaps.length) {
+                return state;
+            }
+            const match = Object.assign({}, state.current_match);
+            pendingTaps.forEach(tap => {
+                const key = tap.team === 1 ? 'score1' : 'score2';
+                match[key] = Math.max(0, match[key] + tap.delta);
+            });
+            return Object.assign({}, state, {current_match: match});
+        }
+
+        function tapsSettled() {
+            return Promise.allSettled(pendingTaps.map(tap => tap.request));
+        }
+
+        // Every change carries an Idempotency-Key (this page's id and a
+        // sequence number), so retrying one after a dropped connection can't
+        // apply it twice. The response has everything that changed since our
+        // version, so there is no refetch afterwards.
+        const CLIENT_ID = Math.random().toString(36).slice(2, 10);
+        const MUTATION_RETRIES = 3;
+        let mutationSeq = 0;
+
+        function mutate(path, body) {
+            const key = `${CLIENT_ID}-${++mutationSeq}`;
+            const send = attempt => fetch(`${BASE}${path}?since=${stateVersion || ''}`, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json', 'Idempotency-Key': key},
+                body: JSON.stringify(body || {})
+            }).then(r => {
+                if (r.status >= 500) {
+                    throw new Error(`${path} failed with ${r.status}`);
+                }
+                return r.json();
+            }).catch(err => {
+                if (attempt >= MUTATION_RETRIES) {
+                    throw err;
+                }
+                return new Promise(resolve => setTimeout(resolve, 250 * 2 ** attempt))
+                    .then(() => send(attempt + 1));
+            });
+            return send(0).then(result => {
+                if ('version' in result) {
+                    offerState(result.version, result.full, result.changes);
+                }
+                return result;
+            });
+        }
+
+        function loadData() {
+            if (pendingTaps.length) {
+                return;
+            }
+            const url = state ? `${BASE}/get_data?since=${stateVersion}` : `${BASE}/get_data`;
+            fetch(url)
+                .then(r => Promise.all([r.headers.get('X-State-Version'), r.json()]))
+                .then(([version, result]) => {
+                    if (!state) {
+                        offerState(version, true, result);
+                    } else {
+                        offerState(version, result.full, result.changes);
+                    }
                 });
         }
 
         function updateScore(team, delta) {
-            fetch('/update_score', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({team, delta})
-            }).then(() => loadData());
+            const tap = {team, delta, done: false};
+            pendingTaps.push(tap);
+            scheduleRender();
+            tap.request = mutate('/update_score', {team, delta}).finally(() => {
+                tap.done = true;
+                if (pendingTaps.every(t => t.done)) {
+                    pendingTaps = [];
+                    if (heldState) {
+                        mergeState(...heldState);
+                        heldState = null;
+                    }
+                    scheduleRender();
+                }
+            }).catch(() => loadData());  // gave up retrying, resync with the server
         }
 
         function resetScore() {
             if (confirm('Reset current scores to 0?')) {
-                fetch('/reset_score', {method: 'POST'})
-                    .then(() => loadData());
+                tapsSettled().then(() => mutate('/reset_score'));
             }
         }
 
         function finishMatch() {
-            fetch('/finish_match', {method: 'POST'})
-                .then(r => r.json())
+            // Score taps still on their way have to land first
+            tapsSettled()
+                .then(() => mutate('/finish_match'))
                 .then(result => {
                     if (result.error) {
                         alert(result.error);
                     } else if (result.message) {
                         alert(result.message);
                     }
-                    loadData();
                 });
         }
 
@@ -417,238 +1693,1445 @@ HTML_TEMPLATE = '''
                 alert('Please enter a team name');
                 return;
             }
-            fetch('/add_team', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({team})
-            }).then(r => r.json())
-            .then(result => {
-                if (result.error) {
-                    alert(result.error);
-                } else {
-                    document.getElementById('newTeam').value = '';
-                }
-                loadData();
-            });
+            mutate('/add_team', {team})
+                .then(result => {
+                    if (result.error) {
+                        alert(result.error);
+                    } else {
+                        document.getElementById('newTeam').value = '';
+                    }
+                });
+        }
+
+        function importTeams(input) {
+            const file = input.files[0];
+            if (!file) {
+                return;
+            }
+            const format = /\\.(ndjson|jsonl)$/i.test(file.name) ? 'ndjson' : 'csv';
+            fetch(`${BASE}/import_teams?format=${format}`, {method: 'POST', body: file})
+                .then(r => r.json())
+                .then(result => {
+                    input.value = '';
+                    let message = `Added ${result.added} team(s)`;
+                    if (result.duplicates) {
+                        message += `, skipped ${result.duplicates} duplicate(s)`;
+                    }
+                    if (result.invalid) {
+                        message += `, ${result.invalid} unreadable line(s)`;
+                    }
+                    alert(message);
+                    loadData();
+                });
         }
 
         function removeTeam(team) {
             if (confirm(`Remove ${team} from the system?`)) {
-                fetch('/remove_team', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({team})
-                }).then(() => loadData());
+                tapsSettled().then(() => mutate('/remove_team', {team}));
             }
         }
 
         function clearStats() {
             if (confirm('Clear all team statistics? This cannot be undone.')) {
-                fetch('/clear_stats', {method: 'POST'})
-                    .then(() => loadData());
+                tapsSettled().then(() => mutate('/clear_stats'));
+            }
+        }
+
+        // Polling is only the fallback for when the event stream is unavailable
+        let pollTimer = null;
+        function startPolling() {
+            if (!pollTimer) {
+                loadData();
+                // Refresh data every 2 seconds
+                pollTimer = setInterval(loadData, 2000);
+            }
+        }
+        function stopPolling() {
+            if (pollTimer) {
+                clearInterval(pollTimer);
+                pollTimer = null;
             }
         }
 
-        // Load data on page load
-        loadData();
-        // Refresh data every 2 seconds
-        setInterval(loadData, 2000);
+        if (window.EventSource) {
+            // The server pushes the full state whenever it changes
+            const source = new EventSource(`${BASE}/events`);
+            source.onmessage = e => {
+                stopPolling();
+                offerState(e.lastEventId, true, JSON.parse(e.data));
+            };
+            // EventSource reconnects by itself, poll until it does
+            source.onerror = () => startPolling();
+        } else {
+            startPolling();
+        }
     </script>
 </body>
 </html>
 '''
 
-@app.route('/')
-def index():
-    return render_template_string(HTML_TEMPLATE)
+# State changes. Each takes the state plus the arguments of one event and
+# returns the JSON result for the client; the same functions replay the event
+# log at startup, so they must only depend on their arguments.
 
-@app.route('/get_data')
-def get_data():
-    return jsonify(data)
+def court_matches(data):
+    # Match dicts of every court, court 0 first
+    return [data['current_match']] + data['courts']
 
-@app.route('/update_score', methods=['POST'])
-def update_score():
-    req = request.json
-    team = req['team']
-    delta = req['delta']
-    
+def court_match(data, court):
+    # Match dict of court number `court`, None if there's no such court
+    if isinstance(court, bool) or not isinstance(court, int):
+        raise TypeError('court must be a number')
+    matches = court_matches(data)
+    return matches[court] if 0 <= court < len(matches) else None
+
+def court_scheduler(data):
+    # A CourtScheduler over the stored courts, sharing the board's queue.
+    # An empty side ('') is None to the scheduler.
+    courts = []
+    for match in court_matches(data):
+        if match['team1'] or match['team2']:
+            courts.append(Match(match['team1'] or None, match['team2'] or None,
+                                match['team1_streak'], match['team2_streak']))
+        else:
+            courts.append(None)
+    return CourtScheduler(courts, ROTATION, data['queue'])
+
+def store_courts(data, scheduler, finished=None):
+    # Write the scheduler's courts back. Scores restart on courts whose pair
+    # changed and on the court that just finished (a rematch keeps the pair).
+    for court, (stored, match) in enumerate(zip(court_matches(data), scheduler.courts)):
+        match = match or Match(None, None, 0, 0)
+        team1 = match.team1 if match.team1 is not None else ''
+        team2 = match.team2 if match.team2 is not None else ''
+        if court == finished or (stored['team1'], stored['team2']) != (team1, team2):
+            stored['score1'] = 0
+            stored['score2'] = 0
+        stored['team1'] = team1
+        stored['team2'] = team2
+        stored['team1_streak'] = match.streak1
+        stored['team2_streak'] = match.streak2
+
+def apply_update_score(data, team, delta, court=0):
+    match = court_match(data, court)
+    if match is None:
+        return {'error': 'No such court'}
     if team == 1:
-        data['current_match']['score1'] = max(0, data['current_match']['score1'] + delta)
+        match['score1'] = max(0, match['score1'] + delta)
     else:
-        data['current_match']['score2'] = max(0, data['current_match']['score2'] + delta)
-    
-    save_data(data)
-    return jsonify({'success': True})
-
-@app.route('/reset_score', methods=['POST'])
-def reset_score():
-    data['current_match']['score1'] = 0
-    data['current_match']['score2'] = 0
-    save_data(data)
-    return jsonify({'success': True})
-
-@app.route('/finish_match', methods=['POST'])
-def finish_match():
-    team1 = data['current_match']['team1']
-    team2 = data['current_match']['team2']
-    score1 = data['current_match']['score1']
-    score2 = data['current_match']['score2']
+        match['score2'] = max(0, match['score2'] + delta)
+    return {'success': True}
+
+def apply_reset_score(data, court=0):
+    match = court_match(data, court)
+    if match is None:
+        return {'error': 'No such court'}
+    match['score1'] = 0
+    match['score2'] = 0
+    return {'success': True}
+
+# Winner stays; with 4+ teams a winner goes to the queue after 2 wins in a row
+ROTATION = RotationEngine()
+
+def apply_finish_match(data, court=0):
+    match = court_match(data, court)
+    if match is None:
+        return {'error': 'No such court'}
+    team1 = match['team1']
+    team2 = match['team2']
+    score1 = match['score1']
+    score2 = match['score2']
     
     if not team1 or not team2:
-        return jsonify({'error': 'Need at least 2 teams playing to finish a match'})
+        return {'error': 'Need at least 2 teams playing to finish a match'}
     
     if score1 == score2:
-        return jsonify({'error': 'Cannot finish match with a tie. Please adjust scores.'})
+        return {'error': 'Cannot finish match with a tie. Please adjust scores.'}
     
     # Initialize stats if needed
     if team1 not in data['stats']:
-        data['stats'][team1] = {'wins': 0, 'losses': 0}
+        data['stats'][team1] = TeamStats()
     if team2 not in data['stats']:
-        data['stats'][team2] = {'wins': 0, 'losses': 0}
+        data['stats'][team2] = TeamStats()
     
-    # Determine winner and loser
-    if score1 > score2:
-        winner = team1
-        loser = team2
-        winner_streak = data['current_match']['team1_streak'] + 1
-        loser_pos = 1  # team2 position
+    if data['courts']:
+        # Several courts share the queue: the scheduler also starts matches
+        # on other courts that were waiting for teams
+        scheduler = court_scheduler(data)
+        outcome = scheduler.finish(court, score1 > score2)
+        scheduler.fill()
+        store_courts(data, scheduler, court)
     else:
-        winner = team2
-        loser = team1
-        winner_streak = data['current_match']['team2_streak'] + 1
-        loser_pos = 0  # team1 position
+        outcome = ROTATION.finish(
+            Match(team1, team2, match['team1_streak'], match['team2_streak']),
+            score1 > score2, data['queue'], len(data['all_teams']))
+        next_match = outcome.next_match
+        if next_match:
+            data['current_match'] = {
+                'team1': next_match.team1,
+                'team2': next_match.team2,
+                'score1': 0,
+                'score2': 0,
+                'team1_streak': next_match.streak1,
+                'team2_streak': next_match.streak2
+            }
+        else:
+            data['current_match'] = new_match()
+    winner = outcome.winner
+    loser = outcome.loser
+    winner_streak = outcome.winner_streak
     
     # Update stats
     data['stats'][winner]['wins'] += 1
     data['stats'][loser]['losses'] += 1
     
-    # Add loser to back of queue
-    if loser in data['queue']:
-        data['queue'].remove(loser)
-    data['queue'].append(loser)
-    
-    total_teams = len(data['all_teams'])
     message = f"{winner} wins! "
-    
-    # Check if winner should go to queue
-    if total_teams > 3 and winner_streak >= 2:
-        # Winner has won 2 games, send to queue
-        if winner in data['queue']:
-            data['queue'].remove(winner)
-        data['queue'].append(winner)
-        message += f"{winner} has won 2 games in a row and goes to the queue. "
-        
-        # Get next 2 teams from queue
-        if len(data['queue']) >= 2:
-            next_team1 = data['queue'].pop(0)
-            next_team2 = data['queue'].pop(0)
-            data['current_match'] = {
-                'team1': next_team1,
-                'team2': next_team2,
-                'score1': 0,
-                'score2': 0,
-                'team1_streak': 0,
-                'team2_streak': 0
-            }
-            message += f"Next match: {next_team1} vs {next_team2}"
+    if outcome.rotated:
+        message += f"{winner} has won {ROTATION.streak_limit} games in a row and goes to the queue. "
+        if outcome.next_match:
+            message += f"Next match: {outcome.next_match.team1} vs {outcome.next_match.team2}"
         else:
-            data['current_match'] = {'team1': '', 'team2': '', 'score1': 0, 'score2': 0, 'team1_streak': 0, 'team2_streak': 0}
             message += "Not enough teams in queue for next match."
     else:
-        # Winner stays, loser replaced
         message += f"{winner} stays on (streak: {winner_streak}). "
-        
-        # Get next team from queue to replace loser
-        if data['queue'] and data['queue'][0] != winner:
-            next_team = data['queue'].pop(0)
-            
-            # Update current match - winner stays in same position
-            if loser_pos == 0:  # loser was team1
-                data['current_match'] = {
-                    'team1': next_team,
-                    'team2': winner,
-                    'score1': 0,
-                    'score2': 0,
-                    'team1_streak': 0,
-                    'team2_streak': winner_streak
-                }
-            else:  # loser was team2
-                data['current_match'] = {
-                    'team1': winner,
-                    'team2': next_team,
-                    'score1': 0,
-                    'score2': 0,
-                    'team1_streak': winner_streak,
-                    'team2_streak': 0
-                }
-            message += f"{next_team} comes in to challenge!"
+        if outcome.next_match:
+            message += f"{outcome.challenger} comes in to challenge!"
         else:
-            data['current_match'] = {'team1': '', 'team2': '', 'score1': 0, 'score2': 0, 'team1_streak': 0, 'team2_streak': 0}
             message += "No teams in queue to replace loser."
     
-    save_data(data)
-    return jsonify({'success': True, 'message': message})
+    return {'success': True, 'message': message, 'winner': winner, 'loser': loser,
+            'winner_score': max(score1, score2), 'loser_score': min(score1, score2), 'winner_streak': winner_streak}
 
-@app.route('/add_team', methods=['POST'])
-def add_team():
-    team = request.json['team']
-    
+def apply_add_team(data, team):
+    team = intern_team(team)
     if team in data['all_teams']:
-        return jsonify({'error': 'Team already exists'})
+        return {'error': 'Team already exists'}
     
     data['all_teams'].append(team)
     
     # Initialize stats
     if team not in data['stats']:
-        data['stats'][team] = {'wins': 0, 'losses': 0}
+        data['stats'][team] = TeamStats()
     
-    # Auto-setup initial match
-    if not data['current_match']['team1']:
-        data['current_match']['team1'] = team
-        data['current_match']['team1_streak'] = 0
-    elif not data['current_match']['team2']:
-        data['current_match']['team2'] = team
-        data['current_match']['team2_streak'] = 0
+    # Auto-setup initial match, on the first court with a free place
+    for match in court_matches(data):
+        if not match['team1']:
+            match['team1'] = team
+            match['team1_streak'] = 0
+            break
+        if not match['team2']:
+            match['team2'] = team
+            match['team2_streak'] = 0
+            break
     else:
         # Add to queue
         data['queue'].append(team)
     
-    save_data(data)
-    return jsonify({'success': True})
+    return {'success': True}
 
-@app.route('/remove_team', methods=['POST'])
-def remove_team():
-    team = request.json['team']
-    
+def apply_remove_team(data, team):
     # Remove from all_teams
     if team in data['all_teams']:
         data['all_teams'].remove(team)
     
+    if data['courts']:
+        # Several courts: the next queued team takes its place on court
+        scheduler = court_scheduler(data)
+        try:
+            scheduler.remove_team(team)
+        except KeyError:
+            return {'success': True}
+        scheduler.fill()
+        store_courts(data, scheduler)
+        return {'success': True}
+    
     # Remove from queue
     if team in data['queue']:
         data['queue'].remove(team)
     
-    # Remove from current match if present
-    if data['current_match']['team1'] == team:
-        data['current_match']['team1'] = ''
-        data['current_match']['team1_streak'] = 0
-        data['current_match']['score1'] = 0
-    if data['current_match']['team2'] == team:
-        data['current_match']['team2'] = ''
-        data['current_match']['team2_streak'] = 0
-        data['current_match']['score2'] = 0
+    # Remove from its court if it is playing
+    for match in court_matches(data):
+        if match['team1'] == team:
+            match['team1'] = ''
+            match['team1_streak'] = 0
+            match['score1'] = 0
+        if match['team2'] == team:
+            match['team2'] = ''
+            match['team2_streak'] = 0
+            match['score2'] = 0
     
-    save_data(data)
-    return jsonify({'success': True})
+    return {'success': True}
 
-@app.route('/clear_stats', methods=['POST'])
-def clear_stats():
+def apply_clear_stats(data):
     data['stats'] = {}
-    data['current_match'] = {'team1': '', 'team2': '', 'score1': 0, 'score2': 0, 'team1_streak': 0, 'team2_streak': 0}
-    data['queue'] = []
-    data['all_teams'] = []
-    save_data(data)
-    return jsonify({'success': True})
+    data['current_match'] = new_match()
+    data['courts'] = [new_match() for _ in data['courts']]
+    data['queue'] = TeamList()
+    data['all_teams'] = TeamList()
+    data['records'] = new_records()
+    return {'success': True}
+
+def apply_set_courts(data, count):
+    # Change how many courts share the queue. New courts start with queued
+    # teams; the teams of dropped courts (the last ones) go to the queue.
+    if isinstance(count, bool) or not isinstance(count, int):
+        raise TypeError('count must be a number')
+    if not 1 <= count <= MAX_COURTS:
+        return {'error': f'Number of courts must be between 1 and {MAX_COURTS}'}
+    while len(data['courts']) >= count:
+        match = data['courts'].pop()
+        for team in (match['team1'], match['team2']):
+            if team:
+                data['queue'].append(team)
+    while len(data['courts']) < count - 1:
+        data['courts'].append(new_match())
+    if data['courts']:
+        scheduler = court_scheduler(data)
+        scheduler.fill()
+        store_courts(data, scheduler)
+    return {'success': True, 'courts': count}
+
+OPS = {
+    'update_score': apply_update_score,
+    'reset_score': apply_reset_score,
+    'finish_match': apply_finish_match,
+    'add_team': apply_add_team,
+    'remove_team': apply_remove_team,
+    'clear_stats': apply_clear_stats,
+    'set_courts': apply_set_courts,
+}
+
+def win_pct(record):
+    games = record['wins'] + record['losses']
+    return record['wins'] / games if games else 0.0
+
+# Sort orders for /leaderboard, best first. The team name ends every key so
+# keys are unique and ties come out alphabetically.
+LEADERBOARD_SORTS = {
+    'win_pct': lambda team, record: (-win_pct(record), -record['wins'], team),
+    'wins': lambda team, record: (-record['wins'], record['losses'], team),
+    'losses': lambda team, record: (-record['losses'], record['wins'], team),
+    'games': lambda team, record: (-(record['wins'] + record['losses']), team),
+}
+
+# Request fields each operation takes, used to validate /batch
+OP_ARGS = {
+    'update_score': ('team', 'delta'),
+    'reset_score': (),
+    'finish_match': (),
+    'add_team': ('team',),
+    'remove_team': ('team',),
+    'clear_stats': (),
+    'set_courts': ('count',),
+}
+
+# Fields an operation may take, passed on by /batch when present
+OP_OPTIONAL_ARGS = {
+    'update_score': ('court',),
+    'reset_score': ('court',),
+    'finish_match': ('court',),
+}
+
+# Sections of the state each operation can replace, used to build
+# /get_data?since= deltas. None means "everything", clients must reload.
+CHANGES = {
+    'update_score': ('current_match', 'courts'),
+    'reset_score': ('current_match', 'courts'),
+    'finish_match': ('current_match', 'queue', 'timing', 'courts'),
+    'add_team': ('current_match', 'queue', 'all_teams', 'timing', 'courts'),
+    'remove_team': ('current_match', 'queue', 'all_teams', 'timing', 'courts'),
+    'clear_stats': None,
+    'set_courts': ('current_match', 'queue', 'timing', 'courts'),
+}
+
+def apply_event(data, event):
+    args = {k: v for k, v in event.items() if k not in ('op', 'seq', 'ts')}
+    pairings = [(match['team1'], match['team2']) for match in court_matches(data)]
+    result = OPS[event['op']](data, **args)
+    if 'error' not in result:
+        update_timing(data, event, pairings)
+        if event['op'] == 'finish_match':
+            update_records(data['records'], result, event.get('ts') or time.time())
+    return result
+
+def court_started(data, court):
+    # When the match on `court` started: timing['match_started'] for court 0,
+    # a 'started' field in the match dict for the other courts
+    if court == 0:
+        return data['timing']['match_started']
+    return data['courts'][court - 1].get('started')
+
+def set_court_started(data, court, started):
+    if court == 0:
+        data['timing']['match_started'] = started
+    else:
+        data['courts'][court - 1]['started'] = started
+
+def update_timing(data, event, pairings):
+    # Track when each court's match started and the rolling match length.
+    # Only the court that finished gives a duration; a court's clock restarts
+    # when it finishes or its pair changes. Uses the event's timestamp so
+    # replaying the log gives the same numbers.
+    timing = data['timing']
+    ts = event.get('ts') or time.time()
+    finished = event.get('court', 0) if event['op'] == 'finish_match' else None
+    if finished is not None and court_started(data, finished) is not None:
+        duration = ts - court_started(data, finished)
+        if MIN_MATCH_SECONDS <= duration <= MAX_MATCH_SECONDS:
+            avg = timing['avg_match_seconds']
+            timing['avg_match_seconds'] = duration if avg is None else avg + MATCH_TIME_ALPHA * (duration - avg)
+            timing['matches_timed'] += 1
+    for court, match in enumerate(court_matches(data)):
+        pairing = pairings[court] if court < len(pairings) else None
+        if court == finished or (match['team1'], match['team2']) != pairing:
+            set_court_started(data, court, ts if match['team1'] and match['team2'] else None)
+
+def update_records(records, result, ts):
+    # O(1) per match: a handful of dict updates, nothing is rescanned
+    winner = result['winner']
+    loser = result['loser']
+    session = records['session']
+    if session['last_match'] is None or ts - session['last_match'] >= SESSION_GAP_SECONDS:
+        session['started'] = ts
+        session['stats'] = {}
+    session['last_match'] = ts
+    day = records['day']
+    date = time.strftime('%Y-%m-%d', time.localtime(ts))
+    if day['date'] != date:
+        day['date'] = date
+        day['stats'] = {}
+    for window in (session['stats'], day['stats']):
+        window.setdefault(winner, {'wins': 0, 'losses': 0})['wins'] += 1
+        window.setdefault(loser, {'wins': 0, 'losses': 0})['losses'] += 1
+
+    h2h = records['head_to_head']
+    h2h.setdefault(winner, {}).setdefault(loser, [0, 0])[0] += 1
+    h2h.setdefault(loser, {}).setdefault(winner, [0, 0])[1] += 1
+
+    streaks = records['streaks']
+    streak = streaks.setdefault(winner, {'current': 0, 'longest': 0})
+    streak['current'] += 1
+    streak['longest'] = max(streak['longest'], streak['current'])
+    streaks.setdefault(loser, {'current': 0, 'longest': 0})['current'] = 0
+    best = records['longest_streak']
+    if best is None or streak['current'] > best['wins']:
+        records['longest_streak'] = {'team': winner, 'wins': streak['current'], 'at': ts}
+
+def client_state(data):
+    # What pages get: the records are only served by /stats
+    return {key: value for key, value in data.items() if key != 'records'}
+
+def changed_stats(event, result):
+    # Teams whose stats entry an event created or updated
+    if event['op'] == 'finish_match':
+        return (result['winner'], result['loser'])
+    if event['op'] == 'add_team':
+        return (event['team'],)
+    return ()
+
+class Subscriber:
+    # One viewer's mailbox. It holds at most SUBSCRIBER_BUFFER messages and
+    # drops the oldest when a slow client falls behind; every message is a
+    # full state, so the newest one is all a client needs to catch up.
+
+    def __init__(self, version=None):
+        self.version = version  # newest version queued, older ones are ignored
+        self.messages = deque(maxlen=SUBSCRIBER_BUFFER)
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+    def put(self, message):
+        with self.lock:
+            if self.version is not None and message.version <= self.version:
+                return
+            self.version = message.version
+            self.messages.append(message)
+            self.ready.set()
+
+    def get(self, timeout):
+        # Next message, or None if nothing arrived within `timeout` seconds
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            message = self.messages.popleft()
+            if not self.messages:
+                self.ready.clear()
+        return message
+
+class Message:
+    # One state version serialized once and shared by every subscriber
+    __slots__ = ('version', 'payload', 'sse')
+
+    def __init__(self, version, payload):
+        self.version = version
+        self.payload = payload
+        self.sse = b'id: %d\ndata: ' % version + payload + b'\n\n'
+
+class Hub:
+    # Broadcasts each new state to all subscribers of a board, whatever the
+    # transport (SSE or long-poll). Publishing costs one serialization plus a
+    # cheap append per subscriber, and never waits for a slow client.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, message):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+class Board:
+    # One scoreboard (court) with its own state, lock and persistence files,
+    # so traffic on one board never waits for or rewrites another
+
+    def __init__(self, board_id):
+        self.id = board_id
+        if board_id == DEFAULT_BOARD:
+            data_file, log_file, db_file, snapshot_file = DATA_FILE, LOG_FILE, DB_FILE, SNAPSHOT_FILE
+        else:
+            data_file, log_file, db_file, snapshot_file = (os.path.join(BOARDS_DIR, board_id + ext)
+                                                           for ext in ('.json', '.log', '.db', '.snap'))
+        self.lock = threading.Lock()
+        # Held while saving in write-behind mode so saves land in order,
+        # always taken before self.lock
+        self.save_lock = threading.Lock()
+        self.dirty_events = 0
+        # Bumped on every change. Starts from the clock so versions keep
+        # increasing across restarts.
+        self.version = int(time.time() * 1000)
+        # Serialized state of the current version, shared by all readers
+        self.message = None
+        self.gzipped = None
+        self.hub = Hub()
+        # Deltas since a version older than reset_version can't be built, the
+        # client gets the full state instead
+        self.reset_version = self.version
+        self.section_versions = dict.fromkeys(('current_match', 'queue', 'all_teams', 'timing', 'courts'), self.version)
+        self.stats_changes = []  # (version, team) in version order
+        self.idempotency = OrderedDict()  # Idempotency-Key -> results
+        # Leaderboard indexes, built on first use for each sort order and then
+        # updated per finished match: sort -> (RankIndex, {team: key})
+        self.rankings = {}
+        self.last_used = time.monotonic()
+        self.closed = False
+        
+        if PERSIST_MODE == 'log':
+            self.store = EventLog(log_file, data_file)
+        elif PERSIST_MODE == 'sqlite':
+            self.store = SqliteStore(db_file, data_file)
+        elif PERSIST_MODE == 'shared':
+            self.store = SharedSqliteStore(db_file, data_file)
+        elif PERSIST_MODE == 'binary':
+            self.store = BinaryStore(snapshot_file, data_file)
+        else:
+            self.store = JsonStore(data_file)
+        self.write_behind = bool(WRITE_BEHIND_MS) and isinstance(self.store, JsonStore)
+        self.data = self.store.load()
+        self.shared = isinstance(self.store, SharedSqliteStore)
+        if self.shared:
+            self.set_version(self.store.version)
+        if EXPORT_DIR:
+            mark_for_export(self)
+
+    def set_version(self, version):
+        # Jump to a version whose changes aren't known here, so clients
+        # behind it get the full state. Called with the lock held.
+        self.version = self.reset_version = version
+        self.section_versions = dict.fromkeys(self.section_versions, version)
+        self.stats_changes.clear()
+        self.rankings.clear()
+
+    def refresh(self):
+        # Shared mode: reload the state if another worker process changed
+        # it. Called with the lock held, returns True if it reloaded.
+        if not self.store.changed():
+            return False
+        self.data = self.store.read_shared()
+        self.set_version(self.store.version)
+        return True
+
+    def sync(self):
+        # Shared mode: catch up with other workers before using the board,
+        # and pass their changes on to this worker's live viewers
+        if not self.shared:
+            return
+        message = None
+        with self.lock:
+            refreshed = self.refresh()
+            if refreshed and self.hub:
+                message = self.snapshot()
+        if message:
+            self.hub.publish(message)
+        if refreshed and EXPORT_DIR:
+            mark_for_export(self)
+
+    def commit(self, event, key=None):
+        # Apply one event to the live state and persist it if it changed anything
+        return self.commit_many([event], key)[0]
+
+    def commit_many(self, events, key=None):
+        # Apply events in order under a single lock hold and persist the ones
+        # that succeeded together. Returns one result per event. With an
+        # idempotency `key` seen before, returns that call's results instead.
+        now = time.time()
+        for event in events:
+            event['ts'] = now
+        flush_now = False
+        message = None
+        with self.lock:
+            if self.closed:
+                # Evicted while this request was running, hand it to the reloaded board
+                return get_board(self.id).commit_many(events, key)
+            if key is not None and key in self.idempotency:
+                self.idempotency.move_to_end(key)
+                return self.idempotency[key]
+            refreshed = False
+            if self.shared:
+                # Hold the database write lock from before reading the state
+                # until the changes are committed, so no other worker's
+                # changes can be lost in between
+                self.store.begin()
+                refreshed = self.refresh()
+            try:
+                results = []
+                applied = []
+                for event in events:
+                    try:
+                        result = apply_event(self.data, event)
+                    except (TypeError, ValueError):
+                        # Bad argument types fail before anything is changed
+                        result = {'error': f"Invalid arguments for {event['op']}"}
+                    results.append(result)
+                    if 'error' not in result:
+                        applied.append((event, result))
+                for event, result in applied:
+                    self.record_changes(event, result)
+                if applied:
+                    if self.write_behind:
+                        self.dirty_events += len(applied)
+                        flush_now = self.dirty_events >= WRITE_BEHIND_MAX_EVENTS
+                    else:
+                        if self.shared:
+                            self.store.version = self.version
+                        start = time.perf_counter()
+                        self.store.append(applied, self.data)
+                        PERSIST_SECONDS.observe((PERSIST_MODE,), time.perf_counter() - start)
+            finally:
+                if self.shared:
+                    self.store.rollback()
+            if key is not None:
+                self.idempotency[key] = results
+                if len(self.idempotency) > IDEMPOTENCY_KEYS_KEEP:
+                    self.idempotency.popitem(last=False)
+            if (applied or refreshed) and self.hub:
+                message = self.snapshot()
+        if message:
+            self.hub.publish(message)
+        if applied and EXPORT_DIR:
+            mark_for_export(self)
+        if flush_now:
+            self.flush()
+        return results
+
+    def record_changes(self, event, result):
+        self.version += 1
+        sections = CHANGES[event['op']]
+        if sections is None:
+            self.reset_version = self.version
+            self.stats_changes.clear()
+            self.rankings.clear()
+            return
+        for section in sections:
+            self.section_versions[section] = self.version
+        for team in changed_stats(event, result):
+            self.stats_changes.append((self.version, team))
+            # A later clear_stats in the same batch may have removed it again
+            if team in self.data['stats']:
+                self.update_rankings(team)
+        if len(self.stats_changes) > STATS_CHANGES_KEEP:
+            drop = len(self.stats_changes) // 2
+            self.reset_version = self.stats_changes[drop - 1][0]
+            del self.stats_changes[:drop]
+
+    def snapshot(self):
+        # The current state as a shared Message, serialized at most once per
+        # version. Called with the lock held.
+        if self.message is None or self.message.version != self.version:
+            self.message = Message(self.version, json.dumps(client_state(self.data), default=to_json).encode())
+            self.gzipped = None
+        return self.message
+
+    def snapshot_gzip(self):
+        # Gzipped payload of snapshot(), also made once per version
+        message = self.snapshot()
+        if self.gzipped is None:
+            self.gzipped = gzip.compress(message.payload, 5)
+        return self.gzipped
+
+    def subscribe(self, since=None):
+        # Register a viewer; unless it already has version `since` it starts
+        # with the current state
+        subscriber = Subscriber(since)
+        with self.lock:
+            subscriber.put(self.snapshot())
+            self.hub.subscribe(subscriber)
+        return subscriber
+
+    def update_rankings(self, team):
+        record = self.data['stats'][team]
+        for sort, (index, keys) in self.rankings.items():
+            key = LEADERBOARD_SORTS[sort](team, record)
+            old = keys.get(team)
+            if old != key:
+                if old is not None:
+                    index.remove(old)
+                index.insert(key)
+                keys[team] = key
+
+    def leaderboard(self, sort, offset, limit):
+        # Called with the lock held
+        if sort not in self.rankings:
+            keys = {team: LEADERBOARD_SORTS[sort](team, record) for team, record in self.data['stats'].items()}
+            self.rankings[sort] = (RankIndex(keys.values()), keys)
+        index, _ = self.rankings[sort]
+        rows = []
+        for rank, key in enumerate(index.slice(offset, limit), offset + 1):
+            team = key[-1]
+            record = self.data['stats'][team]
+            rows.append({'rank': rank, 'team': team, 'wins': record['wins'], 'losses': record['losses'],
+                         'win_pct': round(win_pct(record), 3)})
+        return {'version': self.version, 'sort': sort, 'total': len(index), 'offset': offset, 'teams': rows}
+
+    def delta(self, since):
+        # Everything that changed after version `since`, called with the lock held
+        data = self.data
+        if since < self.reset_version or since > self.version:
+            return {'version': self.version, 'full': True, 'changes': client_state(data)}
+        changes = {section: data[section] for section, version in self.section_versions.items() if version > since}
+        start = bisect.bisect_left(self.stats_changes, (since + 1,))
+        if start < len(self.stats_changes):
+            changes['stats'] = {team: data['stats'][team] for _, team in self.stats_changes[start:] if team in data['stats']}
+        return {'version': self.version, 'full': False, 'changes': changes}
+
+    def flush(self):
+        # Write-behind: save the state if it changed since the last save. Only
+        # serializing happens under the board lock, the disk write doesn't.
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty_events:
+                    return
+                text = json.dumps(self.data, default=to_json)
+                dirty = self.dirty_events
+                self.dirty_events = 0
+            try:
+                start = time.perf_counter()
+                write_file(self.store.path, text)
+                PERSIST_SECONDS.observe(('json-write-behind',), time.perf_counter() - start)
+            except OSError:
+                with self.lock:
+                    self.dirty_events += dirty
+                raise
+
+    def close(self):
+        # Saves under the board lock, so a request that finds the board closed
+        # and reloads it always reads what was saved here
+        with self.save_lock, self.lock:
+            self.closed = True
+            if self.dirty_events:
+                save_data(self.data, self.store.path)
+                self.dirty_events = 0
+            self.store.close()
+
+boards = {}
+boards_lock = threading.Lock()
+board_loading = {}  # board id -> lock held while that board loads
+
+def get_board(board_id):
+    # Boards are loaded on first use and stay in memory until they go idle.
+    # Loading (a JSON parse, a SQLite import...) happens outside boards_lock
+    # under a lock of its own, so it only holds up requests for that board.
+    if not BOARD_ID_RE.match(board_id):
+        abort(404)
+    while True:
+        with boards_lock:
+            board = boards.get(board_id)
+            if board is not None:
+                board.last_used = time.monotonic()
+                break
+            loading = board_loading.setdefault(board_id, threading.Lock())
+        with loading:
+            # Another request may have loaded it while this one waited
+            with boards_lock:
+                loaded = board_id in boards
+            if not loaded:
+                board = Board(board_id)
+                with boards_lock:
+                    boards[board_id] = board
+                    board_loading.pop(board_id, None)
+    board.sync()
+    return board
+
+def evict_idle_boards():
+    while True:
+        time.sleep(BOARD_IDLE_CHECK)
+        cutoff = time.monotonic() - BOARD_IDLE_TIMEOUT
+        with boards_lock:
+            # An exporting shared worker keeps its boards to pick up other workers' changes
+            idle = [board for board in boards.values()
+                    if board.last_used < cutoff and not board.hub and not (EXPORT_DIR and board.shared)]
+            for board in idle:
+                del boards[board.id]
+        for board in idle:
+            board.close()
+
+def watch_shared_boards():
+    # Shared mode: push other workers' changes to this worker's live viewers
+    while True:
+        time.sleep(SHARED_POLL_INTERVAL)
+        with boards_lock:
+            watched = [board for board in boards.values() if board.hub or EXPORT_DIR]
+        for board in watched:
+            board.sync()
+
+def flush_boards():
+    while True:
+        time.sleep(WRITE_BEHIND_MS / 1000)
+        with boards_lock:
+            current = list(boards.values())
+        for board in current:
+            try:
+                board.flush()
+            except OSError:
+                app.logger.exception('Saving board %s failed', board.id)
+
+export_cond = threading.Condition()
+export_pending = {}  # board id -> Board changed since it was last exported
+exported_pages = set()  # directories this process has written index.html to
+
+def mark_for_export(board):
+    with export_cond:
+        export_pending[board.id] = board
+        export_cond.notify()
+
+def export_board(board):
+    # Write the board's current state, serialized the way SSE and /get_data
+    # send it, and the page on the board's first export by this process, so
+    # a page left by an older version is replaced. write_file renames into
+    # place, so the file server never sees a half written file.
+    if not board.closed:
+        board.sync()
+    with board.lock:
+        version = board.version
+        payload = board.snapshot().payload
+    directory = EXPORT_DIR if board.id == DEFAULT_BOARD else os.path.join(EXPORT_DIR, 'b', board.id)
+    if directory not in exported_pages:
+        write_file(os.path.join(directory, 'index.html'), SPECTATOR_PAGE)
+        exported_pages.add(directory)
+    write_file(os.path.join(directory, 'state.json'), b'{"version": %d, "state": ' % version + payload + b'}')
+
+def export_boards(wait=True):
+    # Export thread: after the first change, wait out the debounce window so
+    # a burst of changes turns into one write per board
+    while True:
+        with export_cond:
+            while wait and not export_pending:
+                export_cond.wait()
+        if wait:
+            time.sleep(EXPORT_DEBOUNCE_MS / 1000)
+        with export_cond:
+            pending = list(export_pending.values())
+            export_pending.clear()
+        for board in pending:
+            try:
+                export_board(board)
+            except OSError:
+                app.logger.exception('Exporting board %s failed', board.id)
+        if not wait:
+            return
+
+def sync_logs():
+    # Log mode: append() only checks LOG_FSYNC_INTERVAL when the next event
+    # comes in, this syncs the last events of a log that went quiet
+    while True:
+        time.sleep(LOG_FSYNC_INTERVAL)
+        with boards_lock:
+            current = list(boards.values())
+        for board in current:
+            with board.lock:
+                store = board.store
+                if store.file and store.unsynced and time.monotonic() - store.last_sync >= LOG_FSYNC_INTERVAL:
+                    try:
+                        store.sync()
+                    except OSError:
+                        app.logger.exception('Syncing the log of board %s failed', board.id)
+
+def close_boards():
+    with boards_lock:
+        for board in boards.values():
+            board.close()
+        boards.clear()
+
+# Every route exists twice: at the top level for the default board, as before,
+# and under /b/<board_id>/ for any other board
+def board_route(rule, **options):
+    def decorator(view):
+        app.route(rule, defaults={'board_id': DEFAULT_BOARD}, **options)(view)
+        app.route('/b/<board_id>' + rule, **options)(view)
+        return view
+    return decorator
+
+# The page is the same for every board (it works out its board from the URL),
+# so render it once and keep identity and gzip bodies ready to send
+with app.app_context():
+    INDEX_PAGE = render_template_string(HTML_TEMPLATE).encode()
+INDEX_PAGE_GZIP = gzip.compress(INDEX_PAGE, 9)
+SPECTATOR_PAGE = SPECTATOR_TEMPLATE.replace('__POLL_MS__', str(EXPORT_POLL_SECONDS * 1000))
+INDEX_ETAG = hashlib.sha1(INDEX_PAGE).hexdigest()[:20]
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+@board_route('/')
+def index(board_id):
+    if not BOARD_ID_RE.match(board_id):
+        abort(404)
+    gzipped = accepts_gzip()
+    # Strong ETags have to differ between encodings of the same page
+    etag = INDEX_ETAG + ('-gzip' if gzipped else '')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(INDEX_PAGE_GZIP if gzipped else INDEX_PAGE, mimetype='text/html')
+        if gzipped:
+            response.content_encoding = 'gzip'
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_MAX_AGE
+    return response
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+    if PROFILER.enabled:
+        PROFILER.start(f'{request.method} {route_label()}')
+
+@app.teardown_request
+def stop_profiling(exc):
+    PROFILER.stop()
+
+def route_label():
+    # Board routes are counted under one route whether or not they were
+    # reached through /b/<board_id>
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    if rule.startswith('/b/<board_id>'):
+        rule = rule[len('/b/<board_id>'):] or '/'
+    return rule
+
+@app.after_request
+def record_request(response):
+    # Registered before compress_json so it runs after it and the time
+    # includes compression
+    start = g.pop('request_start', None)
+    if start is not None:
+        rule = route_label()
+        REQUESTS.inc((rule, request.method, str(response.status_code)))
+        REQUEST_SECONDS.observe((rule,), time.perf_counter() - start)
+    return response
+
+@app.after_request
+def compress_json(response):
+    # Gzip bigger JSON bodies (mainly /get_data) for clients that accept it
+    response.vary.add('Accept-Encoding')
+    if (response.mimetype != 'application/json' or response.is_streamed or response.content_encoding
+            or response.content_length is None or response.content_length < GZIP_MIN_SIZE or not accepts_gzip()):
+        return response
+    response.set_data(gzip.compress(response.get_data(), 5))
+    response.content_encoding = 'gzip'
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The compressed body is only equivalent, not byte-identical
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text format: request and persistence metrics recorded so far,
+    # plus the size of every board currently in memory
+    lines = []
+    for metric in (REQUESTS, REQUEST_SECONDS, PERSIST_SECONDS, PERSIST_BYTES):
+        metric.render(lines)
+    with boards_lock:
+        loaded = list(boards.values())
+    gauges = {
+        'scoreboard_teams': ('Teams on the board.', []),
+        'scoreboard_queue_length': ('Teams waiting in the queue.', []),
+        'scoreboard_stats_entries': ('Teams with win/loss stats.', []),
+        'scoreboard_state_bytes': ('Size of the serialized state.', []),
+        'scoreboard_viewers': ('Connected live viewers (SSE and long-poll).', []),
+        'scoreboard_persist_file_bytes': ('Size of the board\'s files on disk.', []),
+    }
+    for board in loaded:
+        label = format_labels(('board',), (board.id,))
+        with board.lock:
+            sizes = {
+                'scoreboard_teams': len(board.data['all_teams']),
+                'scoreboard_queue_length': len(board.data['queue']),
+                'scoreboard_stats_entries': len(board.data['stats']),
+                'scoreboard_state_bytes': len(board.snapshot().payload),
+            }
+        sizes['scoreboard_viewers'] = len(board.hub)
+        for name, value in sizes.items():
+            gauges[name][1].append(f'{name}{label} {value}')
+        for path in (getattr(board.store, 'path', None), getattr(board.store, 'snapshot_path', None)):
+            if path and os.path.exists(path):
+                gauges['scoreboard_persist_file_bytes'][1].append(
+                    f"scoreboard_persist_file_bytes{format_labels(('board', 'file'), (board.id, path))} {os.path.getsize(path)}")
+    for name, (help, samples) in gauges.items():
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(samples)
+    lines.append('# HELP scoreboard_boards_loaded Boards currently in memory.')
+    lines.append('# TYPE scoreboard_boards_loaded gauge')
+    lines.append(f'scoreboard_boards_loaded {len(loaded)}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+def check_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        abort(403)
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    # GET: profiler status. POST {"enabled": true, "fraction": 0.1,
+    # "interval_ms": 5} turns it on or off at runtime; omitted fields keep
+    # their current values.
+    check_admin()
+    if request.method == 'POST':
+        req = request.get_json(silent=True) or {}
+        status = PROFILER.status()
+        try:
+            fraction = float(req.get('fraction', status['fraction']))
+            interval_ms = float(req.get('interval_ms', status['interval_ms']))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'fraction and interval_ms must be numbers'})
+        if not 0 <= fraction <= 1 or not 1 <= interval_ms <= 1000:
+            return jsonify({'error': 'fraction must be between 0 and 1 and interval_ms between 1 and 1000'})
+        PROFILER.configure(bool(req.get('enabled', status['enabled'])), fraction, interval_ms / 1000)
+    return jsonify(PROFILER.status())
+
+@app.route('/admin/profile/stacks')
+def admin_profile_stacks():
+    # Samples so far in collapsed-stack format, one "route;frames... count"
+    # line per stack: pipe into flamegraph.pl or open in speedscope.
+    # ?route=POST%20/finish_match keeps one route, ?reset=1 starts over.
+    check_admin()
+    text = PROFILER.collapsed(request.args.get('route'), request.args.get('reset') == '1')
+    return Response(text, mimetype='text/plain')
+
+@board_route('/get_data')
+def get_data(board_id):
+    # The version doubles as the ETag, so unchanged pollers get an empty 304.
+    # ?since=<version> returns only the sections changed after that version.
+    board = get_board(board_id)
+    since = request.args.get('since', type=int)
+    with board.lock:
+        etag = str(board.version)
+        if since is None and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif since is None:
+            # Every poller of this version shares one serialized (and gzipped) body
+            message = board.snapshot()
+            if len(message.payload) >= GZIP_MIN_SIZE and accepts_gzip():
+                response = Response(board.snapshot_gzip(), mimetype='application/json')
+                response.content_encoding = 'gzip'
+            else:
+                response = Response(message.payload, mimetype='application/json')
+        else:
+            response = jsonify(board.delta(since))
+    response.set_etag(etag, weak=response.content_encoding == 'gzip')
+    response.headers['X-State-Version'] = etag
+    response.cache_control.no_cache = True
+    return response
+
+@board_route('/events')
+def events(board_id):
+    # Server-Sent Events: send the state once on connect, then again only when it changes
+    board = get_board(board_id)
+    
+    def stream():
+        subscriber = board.subscribe()
+        try:
+            while True:
+                message = subscriber.get(SSE_KEEPALIVE)
+                yield message.sse if message else b': keep-alive\n\n'
+        finally:
+            board.hub.unsubscribe(subscriber)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@board_route('/poll')
+def poll(board_id):
+    # Long-poll for clients without EventSource: ?version=<last seen> returns
+    # as soon as there is a newer state, or 204 after LONG_POLL_TIMEOUT
+    board = get_board(board_id)
+    subscriber = board.subscribe(request.args.get('version', type=int))
+    try:
+        message = subscriber.get(LONG_POLL_TIMEOUT)
+    finally:
+        board.hub.unsubscribe(subscriber)
+    if message is None:
+        return Response(status=204)
+    response = Response(message.payload, mimetype='application/json')
+    response.headers['X-State-Version'] = str(message.version)
+    response.cache_control.no_cache = True
+    return response
+
+def mutate(board_id, event):
+    # Apply a change and answer with its result(s) plus the new version and
+    # every section that changed after ?since=<version> (the client's copy),
+    # or since just before this change, so the client needn't fetch the state
+    # again. Requests with an Idempotency-Key header are applied only once.
+    board = get_board(board_id)
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = board.version
+    result = board.commit(event, request.headers.get('Idempotency-Key'))
+    with board.lock:
+        # Serialized under the lock so the delta can't change underneath
+        return jsonify(dict(result, **board.delta(since)))
+
+def on_court(event):
+    # ?court=N picks the court for score and finish routes (default 0, the
+    # current_match)
+    if 'court' in request.args:
+        event['court'] = request.args.get('court', type=int)
+    return event
+
+@board_route('/update_score', methods=['POST'])
+def update_score(board_id):
+    req = request.json
+    return mutate(board_id, on_court({'op': 'update_score', 'team': req['team'], 'delta': req['delta']}))
+
+@board_route('/reset_score', methods=['POST'])
+def reset_score(board_id):
+    return mutate(board_id, on_court({'op': 'reset_score'}))
+
+@board_route('/finish_match', methods=['POST'])
+def finish_match(board_id):
+    return mutate(board_id, on_court({'op': 'finish_match'}))
+
+@board_route('/set_courts', methods=['POST'])
+def set_courts(board_id):
+    # {"count": N}: N courts take their teams from this board's queue
+    return mutate(board_id, {'op': 'set_courts', 'count': (request.json or {}).get('count')})
+
+@board_route('/add_team', methods=['POST'])
+def add_team(board_id):
+    return mutate(board_id, {'op': 'add_team', 'team': request.json['team']})
+
+@board_route('/remove_team', methods=['POST'])
+def remove_team(board_id):
+    return mutate(board_id, {'op': 'remove_team', 'team': request.json['team']})
+
+@board_route('/clear_stats', methods=['POST'])
+def clear_stats(board_id):
+    return mutate(board_id, {'op': 'clear_stats'})
+
+@board_route('/batch', methods=['POST'])
+def batch(board_id):
+    # Apply an ordered list of operations, e.g.
+    #   {"ops": [{"op": "add_team", "team": "A"}, {"op": "update_score", "team": 1, "delta": 1}]}
+    # under one lock with a single save. Operations that fail are skipped and
+    # reported in their slot of "results"; the rest are still applied. Like
+    # the single operation routes it takes ?since= and an Idempotency-Key.
+    body = request.get_json(silent=True)
+    ops = body.get('ops') if isinstance(body, dict) else None
+    if not isinstance(ops, list):
+        return jsonify({'error': 'Expected a list of operations in "ops"'})
+    
+    results = [None] * len(ops)
+    events = []
+    slots = []
+    for i, op in enumerate(ops):
+        name = op.get('op') if isinstance(op, dict) else None
+        if name not in OP_ARGS:
+            results[i] = {'error': f'Unknown operation: {name}'}
+            continue
+        missing = [arg for arg in OP_ARGS[name] if arg not in op]
+        if missing:
+            results[i] = {'error': f'Missing field(s) for {name}: {", ".join(missing)}'}
+            continue
+        args = OP_ARGS[name] + tuple(arg for arg in OP_OPTIONAL_ARGS.get(name, ()) if arg in op)
+        events.append(dict({'op': name}, **{arg: op[arg] for arg in args}))
+        slots.append(i)
+    
+    board = get_board(board_id)
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = board.version
+    for i, result in zip(slots, board.commit_many(events, request.headers.get('Idempotency-Key'))):
+        results[i] = result
+    with board.lock:
+        return jsonify(dict(board.delta(since), success=True, results=results))
+
+def read_team_names(stream, fmt, invalid):
+    # Yield team names from an upload as it is read. CSV takes the first
+    # column and skips a "team" header; NDJSON takes {"team": ...} objects or
+    # plain strings. Unusable lines are appended to `invalid` as line numbers,
+    # including lines that aren't valid UTF-8 (decoded with U+FFFD in them).
+    text = io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8-sig', errors='replace', newline='')
+    if fmt == 'csv':
+        reader = csv.reader(text)
+        for row in reader:
+            if reader.line_num == 1 and row and row[0].strip().lower() == 'team':
+                continue
+            if any('\ufffd' in cell for cell in row):
+                invalid.append(reader.line_num)
+                continue
+            name = row[0].strip() if row else ''
+            if name:
+                yield name
+            elif any(cell.strip() for cell in row):
+                invalid.append(reader.line_num)
+        return
+    for line_num, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        if '\ufffd' in line:
+            invalid.append(line_num)
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            invalid.append(line_num)
+            continue
+        name = item.get('team') if isinstance(item, dict) else item
+        if isinstance(name, str) and name.strip():
+            yield name.strip()
+        else:
+            invalid.append(line_num)
+
+def upload_format():
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'ndjson' if 'ndjson' in (request.mimetype or '') else 'csv'
+    if fmt not in ('csv', 'ndjson'):
+        abort(400)
+    return fmt
+
+@board_route('/import_teams', methods=['POST'])
+def import_teams(board_id):
+    # Bulk add teams from a CSV or NDJSON upload (?format=, or from the
+    # Content-Type). The body is parsed as it streams in, names already on the
+    # board or earlier in the file are skipped through a set, and the rest go
+    # through the normal add_team rules in one commit with a single save.
+    fmt = upload_format()
+    board = get_board(board_id)
+    with board.lock:
+        existing = set(board.data['all_teams'])
+    invalid = []
+    seen = set()
+    events = []
+    duplicates = 0
+    for name in read_team_names(request.stream, fmt, invalid):
+        if name in seen or name in existing:
+            duplicates += 1
+            continue
+        seen.add(name)
+        events.append({'op': 'add_team', 'team': name})
+    # Teams added by someone else while the upload was read fail here as duplicates
+    results = board.commit_many(events) if events else []
+    added = sum(1 for result in results if 'error' not in result)
+    return jsonify({'success': True, 'added': added, 'duplicates': duplicates + len(results) - added,
+                    'invalid': len(invalid), 'invalid_lines': invalid[:IMPORT_MAX_REPORTED]})
+
+@board_route('/export_teams')
+def export_teams(board_id):
+    # Stream every team with its place in the rotation and its record, as CSV
+    # or NDJSON. Teams come in rotation order (on court, then the queue), so
+    # importing the file into an empty board sets up the same rotation.
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        abort(400)
+    board = get_board(board_id)
+    with board.lock:
+        data = board.data
+        playing = [team for match in court_matches(data) for team in (match['team1'], match['team2']) if team]
+        order = playing + list(data['queue'])
+        listed = set(order)
+        order += [team for team in data['all_teams'] if team not in listed]
+        rows = []
+        for team in order:
+            record = data['stats'].get(team) or {'wins': 0, 'losses': 0}
+            status = 'playing' if team in playing else 'queued' if team in data['queue'] else 'idle'
+            rows.append((team, status, record['wins'], record['losses']))
+
+    def generate():
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(('team', 'status', 'wins', 'losses'))
+            for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+                writer.writerows(rows[start:start + EXPORT_CHUNK_ROWS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for start in range(0, len(rows), EXPORT_CHUNK_ROWS):
+                yield ''.join(json.dumps({'team': team, 'status': status, 'wins': wins, 'losses': losses}) + '\n'
+                              for team, status, wins, losses in rows[start:start + EXPORT_CHUNK_ROWS])
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=teams-{board.id}.{fmt}'})
+
+def match_ends(remaining, avg, count):
+    # Seconds from now until each of the next `count` matches ends over all
+    # courts: court i's current match ends after remaining[i], then one
+    # every avg
+    ends = []
+    heap = list(remaining)
+    heapq.heapify(heap)
+    while len(ends) < count:
+        end = heapq.heappop(heap)
+        ends.append(end)
+        heapq.heappush(heap, end + avg)
+    return ends
+
+@board_route('/eta')
+def eta(board_id):
+    # Estimated wait for every queued team: expected matches until it is on
+    # court (from the rotation rules), each ending when the next court frees
+    # up. Every court runs matches of the rolling match length, minus how long
+    # its current match has been going.
+    board = get_board(board_id)
+    with board.lock:
+        data = board.data
+        queue = list(data['queue'])
+        courts = [(dict(match), court_started(data, court)) for court, match in enumerate(court_matches(data))]
+        timing = dict(data['timing'])
+        total_teams = len(data['all_teams'])
+    now = time.time()
+    avg = timing['avg_match_seconds'] or DEFAULT_MATCH_SECONDS
+    remaining = [avg if started is None else max(avg - (now - started), 0) for _, started in courts]
+    # The queue moves whenever any court finishes, so the rotation rules are
+    # applied from the court that frees up first
+    match = courts[min(range(len(courts)), key=remaining.__getitem__)][0]
+    streak = max(match['team1_streak'], match['team2_streak'])
+    matches = ROTATION.expected_matches(streak, len(queue), total_teams)
+    ends = match_ends(remaining, avg, int(max(matches)) + 1 if matches else 0)
+    result = []
+    for i, (team, ahead) in enumerate(zip(queue, matches)):
+        # Between the ends of the matches either side of a fractional count
+        whole = int(ahead)
+        wait = ends[whole - 1] + (ahead - whole) * (ends[whole] - ends[whole - 1])
+        result.append({'team': team, 'position': i + 1, 'matches_ahead': round(ahead, 2),
+                       'eta_seconds': round(wait)})
+    return jsonify({
+        'avg_match_seconds': round(avg),
+        'match_started': timing['match_started'],
+        'courts': len(courts),
+        'now': now,
+        'queue': result,
+    })
+
+@board_route('/leaderboard')
+def leaderboard(board_id):
+    # Ranked stats, one page at a time: ?sort=win_pct|wins|losses|games&limit=20&offset=0
+    sort = request.args.get('sort', 'win_pct')
+    if sort not in LEADERBOARD_SORTS:
+        return jsonify({'error': f'Unknown sort, use one of: {", ".join(LEADERBOARD_SORTS)}'})
+    limit = max(0, min(request.args.get('limit', 20, type=int), 500))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    board = get_board(board_id)
+    with board.lock:
+        return jsonify(board.leaderboard(sort, offset, limit))
+
+@board_route('/history')
+def history(board_id):
+    # Finished matches, newest first: ?team=<name>&limit=50&before=<match id>
+    board = get_board(board_id)
+    if not isinstance(board.store, SqliteStore):
+        return jsonify({'error': 'Match history needs SCOREBOARD_PERSIST=sqlite or shared'})
+    limit = max(0, min(request.args.get('limit', 50, type=int), 500))
+    with board.lock:
+        matches = board.store.history(request.args.get('team'), request.args.get('before', type=int), limit)
+    return jsonify({'matches': matches})
+
+@board_route('/stats')
+def stats(board_id):
+    # Standings for ?window=session (default), day or all, best first, plus
+    # the longest win streak; ?team=<name> adds that team's head-to-head
+    # record and streaks. All from the aggregates finish_match keeps, so no
+    # match history is read.
+    window = request.args.get('window', 'session')
+    if window not in ('session', 'day', 'all'):
+        return jsonify({'error': 'Unknown window, use one of: session, day, all'})
+    team = request.args.get('team')
+    now = time.time()
+    board = get_board(board_id)
+    with board.lock:
+        data = board.data
+        records = data['records']
+        result = {'window': window, 'longest_streak': records['longest_streak']}
+        if window == 'session':
+            session = records['session']
+            table = session['stats']
+            result['started'] = session['started']
+            result['last_match'] = session['last_match']
+            # Over once nothing has finished for a while, the next match starts a new one
+            result['active'] = session['last_match'] is not None and now - session['last_match'] < SESSION_GAP_SECONDS
+        elif window == 'day':
+            result['date'] = time.strftime('%Y-%m-%d', time.localtime(now))
+            table = records['day']['stats'] if records['day']['date'] == result['date'] else {}
+        else:
+            table = data['stats']
+        standings = [(name, record['wins'], record['losses']) for name, record in table.items()]
+        if team is not None:
+            result['team'] = team
+            result['streak'] = records['streaks'].get(team, {'current': 0, 'longest': 0})
+            result['head_to_head'] = {opponent: {'wins': wins, 'losses': losses}
+                                      for opponent, (wins, losses) in records['head_to_head'].get(team, {}).items()}
+    standings.sort(key=lambda row: (-row[1], row[2], row[0]))
+    result['standings'] = [{'team': name, 'wins': wins, 'losses': losses} for name, wins, losses in standings]
+    return jsonify(result)
+
+threading.Thread(target=evict_idle_boards, daemon=True).start()
+if WRITE_BEHIND_MS and PERSIST_MODE == 'json':
+    threading.Thread(target=flush_boards, daemon=True).start()
+if PERSIST_MODE == 'shared':
+    threading.Thread(target=watch_shared_boards, daemon=True).start()
+if PERSIST_MODE == 'log':
+    threading.Thread(target=sync_logs, daemon=True).start()
+# Save anything still pending on shutdown, however the process is run
+atexit.register(close_boards)
+if EXPORT_DIR:
+    threading.Thread(target=export_boards, daemon=True).start()
+    # Registered last so it runs first, while the boards are still open
+    atexit.register(export_boards, wait=False)
+    # Export the default board straight away so viewers have something to load
+    get_board(DEFAULT_BOARD)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Threaded so open /events streams don't block other requests
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,96 @@
+# RankIndex (the skip list behind /leaderboard) against a sorted list, and
+# /leaderboard pages against the stats after a run of finished matches.
+#
+#   python -m pytest test_leaderboard.py
+
+import importlib.util
+import os
+import random
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_app():
+    # Import test.py by path (there is a stdlib package called `test`)
+    sys.path.insert(0, HERE)
+    spec = importlib.util.spec_from_file_location('scoreboard_under_test', os.path.join(HERE, 'test.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+scoreboard = load_app()
+
+def check_slices(index, reference, rng):
+    assert len(index) == len(reference)
+    assert index.slice(0, len(reference) + 1) == reference
+    for _ in range(20):
+        offset = rng.randint(0, len(reference) + 2)
+        limit = rng.randint(0, 30)
+        assert index.slice(offset, limit) == reference[offset:offset + limit]
+
+def test_rank_index_matches_sorted_list():
+    rng = random.Random(9)
+    reference = sorted({(rng.randint(0, 50), f'T{i}') for i in range(200)})
+    index = scoreboard.RankIndex(reference)
+    check_slices(index, reference, rng)
+    for step in range(3000):
+        if reference and rng.random() < 0.5:
+            key = rng.choice(reference)
+            index.remove(key)
+            reference.remove(key)
+        else:
+            key = (rng.randint(0, 50), f'N{step}')
+            index.insert(key)
+            reference.append(key)
+            reference.sort()
+        if step % 100 == 0:
+            check_slices(index, reference, rng)
+    check_slices(index, reference, rng)
+
+def test_rank_index_empty_and_emptied():
+    rng = random.Random(1)
+    index = scoreboard.RankIndex()
+    assert len(index) == 0
+    assert index.slice(0, 10) == []
+    index.insert((1, 'A'))
+    index.insert((0, 'B'))
+    assert index.slice(0, 10) == [(0, 'B'), (1, 'A')]
+    index.remove((0, 'B'))
+    index.remove((1, 'A'))
+    check_slices(index, [], rng)
+
+@pytest.fixture
+def board(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scoreboard, 'PERSIST_MODE', 'json')
+    yield scoreboard.get_board('leaderboard')
+    scoreboard.close_boards()
+
+def expected_order(stats, sort):
+    key = scoreboard.LEADERBOARD_SORTS[sort]
+    return [team for team in sorted(stats, key=lambda team: key(team, stats[team]))]
+
+@pytest.mark.parametrize('sort', list(scoreboard.LEADERBOARD_SORTS))
+def test_leaderboard_follows_finished_matches(board, sort):
+    rng = random.Random(sort)
+    client = scoreboard.app.test_client()
+    for i in range(12):
+        client.post('/b/leaderboard/add_team', json={'team': f'T{i}'})
+    for round_ in range(4):
+        # A first call builds the ranking, later finishes update it in place
+        for _ in range(15):
+            client.post('/b/leaderboard/update_score', json={'team': rng.choice([1, 2]), 'delta': 1})
+            client.post('/b/leaderboard/update_score', json={'team': rng.choice([1, 2]), 'delta': 1})
+            client.post('/b/leaderboard/finish_match')
+        stats = client.get('/b/leaderboard/get_data').get_json()['stats']
+        order = expected_order(stats, sort)
+        page = client.get(f'/b/leaderboard/leaderboard?sort={sort}&limit=5&offset={round_}').get_json()
+        assert page['total'] == len(stats)
+        assert [row['team'] for row in page['teams']] == order[round_:round_ + 5]
+        assert [row['rank'] for row in page['teams']] == list(range(round_ + 1, round_ + 6))
+        for row in page['teams']:
+            assert (row['wins'], row['losses']) == (stats[row['team']]['wins'], stats[row['team']]['losses'])
+    full = client.get(f'/b/leaderboard/leaderboard?sort={sort}&limit=500').get_json()
+    assert [row['team'] for row in full['teams']] == expected_order(stats, sort)
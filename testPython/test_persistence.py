@@ -0,0 +1,71 @@
+# Reload equivalence for every persistence mode: after a random mix of single
+# operations and batches, a board loaded back from its files has to match
+# the one that was in memory. In sqlite and shared mode this checks the
+# per-event row updates in SqliteStore.append (queue order after batched
+# finishes in particular), which nothing else compares with the live state.
+#
+#   python -m pytest test_persistence.py
+
+import importlib.util
+import json
+import os
+import random
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODES = ('json', 'log', 'sqlite', 'binary', 'shared')
+
+def load_app():
+    # Import test.py by path (there is a stdlib package called `test`)
+    sys.path.insert(0, HERE)
+    spec = importlib.util.spec_from_file_location('scoreboard_under_test', os.path.join(HERE, 'test.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+scoreboard = load_app()
+
+def random_op(rng, names):
+    r = rng.random()
+    court = rng.choice([0, 0, 1, 2])
+    if r < 0.45:
+        return {'op': 'update_score', 'team': rng.choice([1, 2]), 'delta': rng.choice([1, 1, 1, -1]), 'court': court}
+    if r < 0.7:
+        return {'op': 'finish_match', 'court': court}
+    if r < 0.85:
+        return {'op': 'add_team', 'team': rng.choice(names)}
+    if r < 0.95:
+        return {'op': 'remove_team', 'team': rng.choice(names)}
+    if r < 0.98:
+        return {'op': 'reset_score', 'court': court}
+    if r < 0.995:
+        return {'op': 'set_courts', 'count': rng.randint(1, 3)}
+    return {'op': 'clear_stats'}
+
+def state_of(board):
+    with board.lock:
+        return json.loads(json.dumps(board.data, default=scoreboard.to_json))
+
+@pytest.mark.parametrize('mode', MODES)
+def test_reload_matches_memory(mode, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scoreboard, 'PERSIST_MODE', mode)
+    rng = random.Random(mode)
+    names = [f'T{i}' for i in range(12)]
+    board = scoreboard.get_board(scoreboard.DEFAULT_BOARD)
+    try:
+        for step in range(300):
+            if rng.random() < 0.3:
+                # Batches put several finishes (and queue moves) in one append
+                board.commit_many([random_op(rng, names) for _ in range(rng.randint(2, 10))])
+            else:
+                board.commit(random_op(rng, names))
+            if step % 25 == 0:
+                expected = state_of(board)
+                scoreboard.close_boards()
+                board = scoreboard.get_board(scoreboard.DEFAULT_BOARD)
+                assert state_of(board) == expected, f'{mode} state differs after reload at step {step}'
+    finally:
+        scoreboard.close_boards()
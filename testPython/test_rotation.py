@@ -0,0 +1,173 @@
+# RotationEngine against the finish_match handler it was extracted from, and
+# CourtScheduler's pairings on several courts.
+#
+#   python -m pytest test_rotation.py
+
+import itertools
+import random
+
+import pytest
+
+from model import TeamList
+from rotation import CourtScheduler, Match, RotationEngine
+
+def old_finish(match, team1_won, queue, total_teams):
+    # The rotation part of the original finish_match handler, on a plain
+    # list queue. Returns the next current_match as (team1, team2, streak1,
+    # streak2), with '' for an empty side.
+    if team1_won:
+        winner, loser, winner_streak, loser_pos = match.team1, match.team2, match.streak1 + 1, 1
+    else:
+        winner, loser, winner_streak, loser_pos = match.team2, match.team1, match.streak2 + 1, 0
+    if loser in queue:
+        queue.remove(loser)
+    queue.append(loser)
+    if total_teams > 3 and winner_streak >= 2:
+        if winner in queue:
+            queue.remove(winner)
+        queue.append(winner)
+        if len(queue) >= 2:
+            return (queue.pop(0), queue.pop(0), 0, 0)
+        return ('', '', 0, 0)
+    if queue and queue[0] != winner:
+        next_team = queue.pop(0)
+        if loser_pos == 0:
+            return (next_team, winner, 0, winner_streak)
+        return (winner, next_team, winner_streak, 0)
+    return ('', '', 0, 0)
+
+def engine_finish(engine, match, team1_won, queue, total_teams):
+    outcome = engine.finish(match, team1_won, queue, total_teams)
+    return outcome, tuple(outcome.next_match) if outcome.next_match else ('', '', 0, 0)
+
+def test_three_teams_winner_stays_on():
+    # Three teams or fewer: no two-win rule, the winner keeps playing
+    engine = RotationEngine()
+    queue = TeamList(['C'])
+    outcome, match = engine_finish(engine, Match('A', 'B', 1, 0), True, queue, 3)
+    assert match == ('A', 'C', 2, 0)
+    assert (outcome.winner, outcome.loser, outcome.winner_streak, outcome.rotated) == ('A', 'B', 2, False)
+    assert outcome.challenger == 'C'
+    assert list(queue) == ['B']
+
+def test_two_wins_send_the_winner_to_the_queue():
+    engine = RotationEngine()
+    queue = TeamList(['C', 'D'])
+    outcome, match = engine_finish(engine, Match('A', 'B', 1, 0), True, queue, 4)
+    assert outcome.rotated and outcome.challenger is None
+    assert match == ('C', 'D', 0, 0)
+    assert list(queue) == ['B', 'A']
+
+def test_first_win_stays_on_with_four_teams():
+    engine = RotationEngine()
+    queue = TeamList(['C', 'D'])
+    outcome, match = engine_finish(engine, Match('A', 'B', 0, 0), False, queue, 4)
+    assert not outcome.rotated
+    assert match == ('C', 'B', 0, 1)
+    assert list(queue) == ['D', 'A']
+
+def test_empty_queue_brings_the_loser_back():
+    # Two teams: nobody is queued, so the loser goes to the queue and comes
+    # straight back as the challenger, as in the old handler
+    engine = RotationEngine()
+    queue = TeamList()
+    outcome, match = engine_finish(engine, Match('A', 'B', 0, 0), True, queue, 2)
+    assert match == old_finish(Match('A', 'B', 0, 0), True, [], 2) == ('A', 'B', 1, 0)
+    assert outcome.challenger == 'B'
+    assert list(queue) == []
+
+def test_short_queue_after_rotation():
+    # A rotation with only the loser and the winner to queue starts the next
+    # match from the two of them
+    engine = RotationEngine(small_group=1)
+    queue = TeamList()
+    outcome, match = engine_finish(engine, Match('A', 'B', 1, 0), True, queue, 2)
+    assert outcome.rotated
+    assert match == ('B', 'A', 0, 0)
+    assert list(queue) == []
+
+@pytest.mark.parametrize('teams', range(2, 9))
+def test_matches_old_handler_over_random_sessions(teams):
+    rng = random.Random(teams)
+    engine = RotationEngine()
+    for _ in range(50):
+        names = [f'T{i}' for i in range(teams)]
+        old_queue = names[2:]
+        queue = TeamList(names[2:])
+        match = Match(names[0], names[1], 0, 0)
+        for _ in range(40):
+            team1_won = rng.random() < 0.5
+            expected = old_finish(match, team1_won, old_queue, teams)
+            _, got = engine_finish(engine, match, team1_won, queue, teams)
+            assert got == expected
+            assert list(queue) == old_queue
+            if not got[0]:
+                break
+            match = Match(*got)
+
+def test_expected_matches_small_group_is_one_per_position():
+    assert RotationEngine().expected_matches(1, 3, 3) == [1, 2, 3]
+
+def test_expected_matches_grow_with_position():
+    waits = RotationEngine().expected_matches(0, 20, 22)
+    assert waits[0] == 1
+    assert all(a < b for a, b in zip(waits, waits[1:]))
+
+def play_courts(scheduler, rng, matches):
+    # Finish `matches` matches on random playing courts; returns the pairs
+    played = []
+    for _ in range(matches):
+        court = rng.choice([i for i in range(len(scheduler.courts)) if scheduler.playing(i)])
+        match = scheduler.courts[court]
+        played.append(frozenset(match[:2]))
+        scheduler.finish(court, rng.random() < 0.5)
+        scheduler.fill()
+    return played
+
+def test_one_court_matches_rotation_engine():
+    rng = random.Random(1)
+    for teams in range(2, 9):
+        names = [f'T{i}' for i in range(teams)]
+        scheduler = CourtScheduler(1, queue=TeamList(names))
+        scheduler.fill()
+        engine = RotationEngine()
+        queue = TeamList(names[2:])
+        match = Match(names[0], names[1], 0, 0)
+        for _ in range(100):
+            assert scheduler.courts[0] == match
+            team1_won = rng.random() < 0.5
+            scheduler.finish(0, team1_won)
+            outcome = engine.finish(match, team1_won, queue, teams)
+            assert list(scheduler.queue) == list(queue)
+            if outcome.next_match is None:
+                break
+            match = outcome.next_match
+
+def test_four_teams_on_two_courts_meet_every_opponent():
+    scheduler = CourtScheduler(2, queue=TeamList('ABCD'))
+    assert len(scheduler.fill()) == 2
+    played = play_courts(scheduler, random.Random(2), 200)
+    assert set(played) == {frozenset(pair) for pair in itertools.combinations('ABCD', 2)}
+
+def test_courts_share_the_queue_evenly():
+    # Whoever has sat out longest plays next, so over a long session every
+    # team gets about the same number of games
+    teams = 10
+    scheduler = CourtScheduler(3, queue=TeamList(range(teams)))
+    scheduler.fill()
+    games = [0] * teams
+    for pair in play_courts(scheduler, random.Random(3), 3000):
+        for team in pair:
+            games[team] += 1
+    assert max(games) - min(games) <= 0.1 * max(games)
+
+def test_remove_team_frees_its_place_for_the_queue():
+    scheduler = CourtScheduler(2, queue=TeamList('ABCDE'))
+    scheduler.fill()
+    assert scheduler.remove_team('C') == 1
+    assert scheduler.courts[1] == Match(None, 'D', 0, 0)
+    scheduler.fill()
+    assert scheduler.courts[1] == Match('E', 'D', 0, 0)
+    assert scheduler.remove_team('A') == 0
+    with pytest.raises(KeyError):
+        scheduler.remove_team('C')